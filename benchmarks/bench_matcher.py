@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Compares matching a path against STATIC_GENERATOR_URLS one regex at a time
+(the old middleware loop) with URLMatcher, for growing numbers of patterns.
+
+    PYTHONPATH=`pwd` python benchmarks/bench_matcher.py
+"""
+import random
+import re
+import timeit
+
+from staticgenerator.matcher import URLMatcher
+
+SIZES = (10, 100, 500, 1000)
+PATHS = 2000
+NUMBER = 5
+
+def get_patterns(count):
+    return [r'^/section%d/(\d+)/[\w-]+/$' % i for i in range(count)]
+
+def get_paths(count):
+    # Half the paths miss every pattern, which is the worst case for a loop
+    rnd = random.Random(count)
+    paths = []
+    for i in range(PATHS):
+        if i % 2:
+            paths.append('/section%d/%d/some-slug/' % (rnd.randrange(count), i))
+        else:
+            paths.append('/elsewhere/%d/' % i)
+    return paths
+
+def loop_match(regexes, path):
+    for regex in regexes:
+        if regex.match(path):
+            return True
+    return False
+
+def main():
+    print '%8s %14s %14s %14s' % ('patterns', 'loop (us)', 'combined (us)', 'cached (us)')
+    for size in SIZES:
+        patterns = get_patterns(size)
+        paths = get_paths(size)
+
+        regexes = [re.compile(pattern) for pattern in patterns]
+        uncached = URLMatcher(patterns, cache_size=0)
+        cached = URLMatcher(patterns, cache_size=2 * PATHS)
+
+        timings = []
+        for match in (lambda path: loop_match(regexes, path), uncached.match, cached.match):
+            seconds = min(timeit.repeat(lambda: [match(path) for path in paths], number=NUMBER, repeat=3))
+            timings.append(seconds / (NUMBER * PATHS) * 1e6)
+
+        print '%8d %14.2f %14.2f %14.2f' % ((size,) + tuple(timings))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Compares rendering pages through the whole middleware stack (the default)
+with the fast path calling views directly.
+
+    PYTHONPATH=`pwd` python benchmarks/bench_render.py
+"""
+import time
+
+from django.conf import settings
+
+settings.configure(
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    INSTALLED_APPS=[
+        'django.contrib.contenttypes',
+        'django.contrib.auth',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+    ],
+    MIDDLEWARE=[
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ],
+    ROOT_URLCONF=__name__,
+    TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates'}],
+    WEB_ROOT='/tmp/staticgenerator-bench',
+    SERVER_NAME='localhost',
+    ALLOWED_HOSTS=['*'],
+    SECRET_KEY='bench',
+)
+
+import django
+django.setup()
+
+from django.conf.urls import url
+from django.http import HttpResponse
+from django.template import engines
+
+from staticgenerator import StaticGenerator
+
+PAGES = 5000
+REPEAT = 3
+
+template = engines['django'].from_string(
+    '<html><body><h1>{{ title }}</h1>{% for i in items %}<p>{{ i }}</p>{% endfor %}</body></html>')
+
+def page(request, n):
+    return HttpResponse(template.render({'title': 'Page %s' % n, 'items': range(20)}))
+
+urlpatterns = [url(r'^pages/(\d+)/$', page)]
+
+def timed(**kw):
+    gen = StaticGenerator(**kw)
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        for n in xrange(PAGES):
+            gen.get_content_from_path('/pages/%d/' % n)
+        elapsed = time.time() - start
+        best = min(best, elapsed) if best is not None else elapsed
+    return best
+
+def main():
+    full = timed()
+    fast = timed(render='fast')
+    subset = timed(render='fast', render_middleware=('django.middleware.common.CommonMiddleware',))
+
+    print 'Rendering %d pages (best of %d)' % (PAGES, REPEAT)
+    for name, seconds in (('full middleware stack', full), ('fast path', fast), ('fast path + CommonMiddleware', subset)):
+        print '  %-30s %6.3fs  %8.1f pages/s  %6.1f us/page' % (name, seconds, PAGES / seconds, seconds / PAGES * 1e6)
+    print '  saving per page: %.1f us' % ((full - fast) / PAGES * 1e6)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Compares extracting the URLs of a QuerySet through get_absolute_url() with
+building them from values_list() rows registered through register_url().
+
+    PYTHONPATH=`pwd` python benchmarks/bench_urls.py
+"""
+import time
+
+from django.conf import settings
+
+settings.configure(
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    INSTALLED_APPS=[],
+    WEB_ROOT='/tmp/staticgenerator-bench',
+    SERVER_NAME='localhost',
+)
+
+import django
+django.setup()
+
+from django.db import connection, models
+
+from staticgenerator import StaticGenerator
+
+ROWS = 20000
+REPEAT = 3
+
+class Post(models.Model):
+    slug = models.SlugField()
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = 'bench'
+
+    def get_absolute_url(self):
+        return '/blog/%s/' % self.slug
+
+def create_posts():
+    with connection.schema_editor() as editor:
+        editor.create_model(Post)
+    body = 'lorem ipsum ' * 200
+    Post.objects.bulk_create([Post(slug='post-%d' % i, title='Post %d' % i, body=body) for i in range(ROWS)])
+
+def timed(**kw):
+    best = None
+    for i in range(REPEAT):
+        start = time.time()
+        paths = list(StaticGenerator(Post.objects.all(), lazy=True, **kw).resources)
+        elapsed = time.time() - start
+        best = min(best, elapsed) if best is not None else elapsed
+    assert len(paths) == ROWS
+    return best
+
+def main():
+    create_posts()
+    builders = {Post: (('slug',), '/blog/%(slug)s/')}
+
+    print '%-28s %10s %12s' % ('extraction', 'seconds', 'urls/sec')
+    for name, kw in (('get_absolute_url', {'url_builders': {}}),
+                     ('values_list builder', {'url_builders': builders})):
+        seconds = timed(**kw)
+        print '%-28s %10.3f %12d' % (name, seconds, ROWS / seconds)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""An in-memory stand-in for staticgenerator.filesystem.FileSystem."""
+import errno
+import hashlib
+import itertools
+import os
+import posixpath
+from collections import defaultdict
+
+
+class MemoryFileSystem(object):
+    """
+    Keeps files in a dict so benchmarks can measure StaticGenerator itself,
+    without the disk. Only implements what StaticGenerator uses.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.directories = set(['/'])
+        self.descriptors = {}
+        self.counter = itertools.count()
+        # directory -> names of the entries in it
+        self.children = defaultdict(set)
+
+    def exists(self, path):
+        return path in self.files or path in self.directories
+
+    def getsize(self, path):
+        try:
+            return len(self.files[path])
+        except KeyError:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+
+    def digest(self, path):
+        return hashlib.md5(self.files[path]).hexdigest()
+
+    def makedirs(self, path):
+        if path in self.directories:
+            raise OSError(errno.EEXIST, os.strerror(errno.EEXIST), path)
+        while path not in self.directories:
+            self.directories.add(path)
+            path, name = posixpath.split(path)
+            self.children[path].add(name)
+
+    def tempfile(self, directory):
+        if directory not in self.directories:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), directory)
+        f = next(self.counter)
+        tmpname = posixpath.join(directory, 'tmp%d' % f)
+        self.descriptors[f] = tmpname
+        self.files[tmpname] = ''
+        self.children[directory].add('tmp%d' % f)
+        return f, tmpname
+
+    def write(self, f, content):
+        self.files[self.descriptors[f]] += content
+        return len(content)
+
+    def close(self, f):
+        del self.descriptors[f]
+
+    def chmod(self, filename, flags):
+        pass
+
+    def rename(self, from_file, to_file):
+        self.files[to_file] = self.files.pop(from_file)
+        directory, name = posixpath.split(from_file)
+        self.children[directory].discard(name)
+        directory, name = posixpath.split(to_file)
+        self.children[directory].add(name)
+
+    def remove(self, path):
+        if path not in self.files:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        del self.files[path]
+        directory, name = posixpath.split(path)
+        self.children[directory].discard(name)
+
+    def rmdir(self, directory):
+        if directory not in self.directories:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), directory)
+        if self.children[directory]:
+            raise OSError(errno.ENOTEMPTY, os.strerror(errno.ENOTEMPTY), directory)
+        self.directories.discard(directory)
+        parent, name = posixpath.split(directory)
+        self.children[parent].discard(name)
+
+    def scandir(self, directory):
+        if directory not in self.directories:
+            raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), directory)
+        return [(name, posixpath.join(directory, name) in self.directories)
+                for name in self.children[directory]]
+
+    def join(self, *paths):
+        if not paths:
+            return ""
+        return posixpath.join(paths[0], *[path.lstrip("/") for path in paths[1:]])
+
+    def dirname(self, path):
+        return posixpath.dirname(path)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Benchmarks the hot paths of StaticGenerator: extract_resources, publish,
+delete and StaticGeneratorMiddleware.process_response.
+
+Pages are synthetic and rendered by a stub handler, so the numbers measure
+StaticGenerator itself (including the Stats instrumentation that provides
+the per-page latencies). Publishing and deleting run against both a real
+FileSystem on tmpfs (/dev/shm when available) and an in-memory one.
+
+    PYTHONPATH=`pwd` python benchmarks/run.py --output results.json
+    PYTHONPATH=`pwd` python benchmarks/run.py --compare results.json
+
+With --compare, the run fails when any benchmark got slower than the
+baseline by more than --tolerance.
+"""
+import json
+import optparse
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+
+settings.configure(
+    WEB_ROOT=tempfile.gettempdir(),
+    SERVER_NAME='localhost',
+    STATIC_GENERATOR_URLS=(r'^/section',),
+    INSTALLED_APPS=[],
+)
+
+import django
+if hasattr(django, 'setup'):
+    django.setup()
+
+from staticgenerator import StaticGenerator
+from staticgenerator.filesystem import FileSystem
+from staticgenerator.middleware import StaticGeneratorMiddleware
+from staticgenerator.stats import Stats
+
+from memoryfs import MemoryFileSystem
+
+PAGES_PER_SECTION = 100
+
+
+class StubResponse(dict):
+    """Headers are looked up like HttpResponse's"""
+    status_code = 200
+    streaming = False
+
+    def __init__(self, content):
+        dict.__init__(self, {'Content-Type': 'text/html; charset=utf-8'})
+        self.content = content
+
+class StubHandler(object):
+    """Stands in for DummyHandler: every page renders to the same content"""
+
+    def __init__(self, content):
+        self.response = StubResponse(content)
+
+    def __call__(self, request):
+        return self.response
+
+class StubRenderEngine(object):
+    def __init__(self, content):
+        self.handler = StubHandler(content)
+
+    def render(self, path):
+        return self.handler(StubRequest(path))
+
+class CustomSettings(object):
+    def __init__(self, web_root):
+        self.WEB_ROOT = web_root
+        self.SERVER_NAME = 'localhost'
+
+class StubRequest(object):
+    def __init__(self, path):
+        self.path_info = path
+        self.META = {}
+
+class SyntheticObject(object):
+    def __init__(self, pk):
+        self.pk = pk
+
+    def get_absolute_url(self):
+        return get_path(self.pk)
+
+class SyntheticQuerySet(list):
+    pass
+
+class SyntheticModelBase(object):
+    pass
+
+class SyntheticManager(object):
+    pass
+
+def get_path(i):
+    return '/section%d/page%d/' % (i // PAGES_PER_SECTION, i)
+
+def get_paths(pages):
+    return [get_path(i) for i in range(pages)]
+
+
+def get_generator(resources, fs, content, **kw):
+    return StaticGenerator(model=SyntheticObject,
+                           model_base=SyntheticModelBase,
+                           manager=SyntheticManager,
+                           queryset=SyntheticQuerySet,
+                           fs=fs,
+                           render_engine=StubRenderEngine(content),
+                           stats=Stats(),
+                           *resources, **kw)
+
+def get_latencies(generator):
+    """Seconds spent on each path, all phases included"""
+    return [sum(phases.values()) for phases in generator.stats.paths.itervalues()]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def summarize(name, fs_name, seconds, count, latencies=None):
+    result = {
+        'name': name,
+        'fs': fs_name,
+        'count': count,
+        'seconds': round(seconds, 6),
+        'per_sec': round(count / seconds, 1) if seconds else None,
+    }
+    if latencies:
+        result['latency_ms'] = {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 4),
+            'p50': round(percentile(latencies, 0.5) * 1000, 4),
+            'p95': round(percentile(latencies, 0.95) * 1000, 4),
+            'max': round(max(latencies) * 1000, 4),
+        }
+    return result
+
+
+def bench_extract(pages):
+    results = []
+    for name, resources in (('extract_resources:strings', get_paths(pages)),
+                            ('extract_resources:objects', [SyntheticQuerySet(SyntheticObject(i) for i in range(pages))])):
+        start = time.time()
+        generator = get_generator(resources, MemoryFileSystem(), '')
+        seconds = time.time() - start
+        assert len(generator.resources) == pages
+        results.append(summarize(name, None, seconds, pages))
+    return results
+
+def bench_publish_and_delete(pages, fs_name, fs, web_root, content):
+    results = []
+    paths = get_paths(pages)
+    for name in ('publish', 'republish', 'delete'):
+        generator = get_generator(paths, fs, content, settings=CustomSettings(web_root))
+        action = name == 'delete' and generator.delete or generator.publish
+        start = time.time()
+        action()
+        seconds = time.time() - start
+        results.append(summarize(name, fs_name, seconds, pages, get_latencies(generator)))
+    return results
+
+def bench_middleware(pages, fs_name, fs, web_root, content):
+    generator = get_generator((), fs, content, settings=CustomSettings(web_root))
+    middleware = StaticGeneratorMiddleware()
+    middleware.gen = generator
+    middleware.queue = None
+
+    requests = [StubRequest(path) for path in get_paths(pages)]
+    response = StubResponse(content)
+
+    start = time.time()
+    for request in requests:
+        middleware.process_response(request, response)
+    seconds = time.time() - start
+    return [summarize('middleware.process_response', fs_name, seconds, pages, get_latencies(generator))]
+
+
+def get_tmpfs_root():
+    base = os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) and '/dev/shm' or None
+    return tempfile.mkdtemp(prefix='staticgenerator-bench-', dir=base)
+
+def run(pages, page_size):
+    content = ('<p>%s</p>\n' % ('x' * 70)) * (page_size // 80 or 1)
+    results = bench_extract(pages)
+
+    results += bench_publish_and_delete(pages, 'memory', MemoryFileSystem(), '/www', content)
+    results += bench_middleware(pages, 'memory', MemoryFileSystem(), '/www', content)
+
+    for bench in (bench_publish_and_delete, bench_middleware):
+        web_root = get_tmpfs_root()
+        try:
+            results += bench(pages, 'tmpfs', FileSystem(), web_root, content)
+        finally:
+            shutil.rmtree(web_root)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pages': pages,
+        'page_size': len(content),
+        'results': results,
+    }
+
+def compare(report, baseline, tolerance):
+    """Prints the speed of each benchmark relative to baseline; returns the regressions"""
+    previous = dict(((result['name'], result['fs']), result) for result in baseline['results'])
+    regressions = []
+    print '%-32s %-8s %12s %12s %8s' % ('benchmark', 'fs', 'baseline/s', 'current/s', 'ratio')
+    for result in report['results']:
+        key = (result['name'], result['fs'])
+        if key not in previous or not previous[key]['per_sec']:
+            continue
+        ratio = result['per_sec'] / previous[key]['per_sec']
+        print '%-32s %-8s %12.1f %12.1f %8.2f' % (result['name'], result['fs'] or '-', previous[key]['per_sec'], result['per_sec'], ratio)
+        if ratio < 1 - tolerance:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--pages', type='int', default=5000, help='number of synthetic pages [%default]')
+    parser.add_option('--page-size', type='int', default=16 * 1024, help='size of each page in bytes [%default]')
+    parser.add_option('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_option('--compare', metavar='BASELINE', help='compare with the JSON results of an earlier run')
+    parser.add_option('--tolerance', type='float', default=0.2, help='slowdown allowed by --compare [%default]')
+    options, args = parser.parse_args()
+
+    report = run(options.pages, options.page_size)
+
+    if options.output:
+        f = open(options.output, 'w')
+        try:
+            json.dump(report, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+    elif not options.compare:
+        print json.dumps(report, indent=2, sort_keys=True)
+
+    if options.compare:
+        f = open(options.compare)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        regressions = compare(report, baseline, options.tolerance)
+        if regressions:
+            print 'Slower than the baseline: %s' % ', '.join(['%s (%s)' % key for key in regressions])
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
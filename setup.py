@@ -8,5 +8,5 @@ setup(name='staticgenerator',
       author="Jared Kuolt",
       author_email="me@superjared.com",
       url="http://superjared.com/projects/static-generator/",
-      packages = ['staticgenerator']
+      packages = ['staticgenerator', 'staticgenerator.management', 'staticgenerator.management.commands']
       )
@@ -2,16 +2,122 @@
 #-*- coding:utf-8 -*-
 
 """Static file generator for Django."""
+import cProfile
+import errno
+import hashlib
+import pstats
+import re
 import stat
+import sys
+import time
+from collections import namedtuple
+from fnmatch import fnmatch
+from operator import attrgetter, itemgetter
+from timeit import default_timer
 
 from django.utils.functional import Promise
 
-from filesystem import FileSystem
-from handlers import DummyHandler
+import dependencies
+from compression import COMPRESSORS, get_compressors
+from crawler import Crawler
+from executors import get_executor
+from filesystem import FileSystem, get_state_dir
+from handlers import DummyHandler, RenderEngine, get_handler
+from incremental import BuildState, to_datetime
+from locks import PathLocks
+from manifest import Manifest, SourcedURL, get_label, get_source, to_unicode
+from shards import parse_shard, shard_of
+from stats import NULL_TIMER, Stats
+from variants import Variants
 
 
 class StaticGeneratorException(Exception):
-    pass
+    """
+    status_code is the HTTP status of a page that rendered with anything but
+    a 200, None for every other failure.
+    """
+
+    def __init__(self, message='', status_code=None):
+        Exception.__init__(self, message)
+        self.status_code = status_code
+
+class Results(list):
+    """
+    The ordered list of Outcomes returned by StaticGenerator.do_all.
+
+    When keep is False (lazy generators) only failed Outcomes are kept; the
+    counters are all that remains of the others.
+    """
+
+    def __init__(self, keep=True):
+        list.__init__(self)
+        self.keep = keep
+        self.total = 0
+        self.written = 0
+        self.skipped = 0
+
+    def add(self, outcome):
+        self.total += 1
+        if outcome.value is True:
+            self.written += 1
+        elif outcome.value is False:
+            self.skipped += 1
+        if self.keep or not outcome.ok:
+            self.append(outcome)
+
+    @property
+    def failed(self):
+        return [outcome for outcome in self if not outcome.ok]
+
+# Index file names of directory-style paths (ending with a /) by the media
+# type of their response, see StaticGenerator.get_index_name. Extensions are
+# those of nginx's mime.types, so pages are served with the right type.
+CONTENT_TYPES = {
+    'application/json': 'index.json',
+    'application/rss+xml': 'index.rss',
+    'application/atom+xml': 'index.atom',
+    'application/xml': 'index.xml',
+    'text/xml': 'index.xml',
+    'text/plain': 'index.txt',
+}
+
+# Extensions of the sidecars any generator may have written
+SIDECAR_EXTENSIONS = sorted(compressor.extension for compressor in COMPRESSORS.values())
+
+# Counts returned by StaticGenerator.purge
+Purged = namedtuple('Purged', 'paths files directories')
+
+class LazyResources(object):
+    """Resources whose paths are only extracted while being iterated"""
+
+    def __init__(self, generator, resources):
+        self.generator = generator
+        self.resources = resources
+
+    def __iter__(self):
+        return self.generator.iter_paths(self.resources)
+
+# Directories known to exist, shared by generators created with
+# share_directory_cache=True
+known_directories = set()
+
+# model -> (fields, builder), see register_url
+url_builders = {}
+
+def register_url(model, fields, builder):
+    """
+    Registers a fast way of building the URL of model's instances from a few
+    of its columns. QuerySets of model are then read with values_list()
+    instead of instantiating every object to call get_absolute_url().
+
+    The builder is either a format string over the fields, or a callable
+    taking their values in order::
+
+        register_url(Post, ('slug',), '/blog/%(slug)s/')
+        register_url(Post, ('pub_date', 'slug'),
+                     lambda pub_date, slug: '/blog/%d/%s/' % (pub_date.year, slug))
+    """
+    url_builders[model] = (tuple(fields), builder)
 
 class StaticGenerator(object):
     """
@@ -35,6 +141,92 @@ class StaticGenerator(object):
     The most effective usage is to associate a StaticGenerator with a model's
     post_save and post_delete signal.
 
+    Big rebuilds can run in parallel by choosing an executor ('serial',
+    'thread' or 'process') and a number of workers::
+
+        quick_publish(Post.objects.all(), executor='process', workers=8)
+
+    Pass fail_silently=True to carry on past failing paths; the Outcome of
+    every path is returned either way.
+
+    With skip_unchanged=True, files whose content would not change are left
+    untouched::
+
+        results = quick_publish(Post.objects.all(), skip_unchanged=True)
+        print results.written, results.skipped
+
+    Pages can also be written with precompressed .gz (and .br, when the
+    brotli module is installed) sidecars for nginx's gzip_static::
+
+        quick_publish('/', compress=('gzip', 'brotli'))
+
+    Given a manifest (a SQLite file), every published and deleted file is
+    recorded along with its size, digest and source object::
+
+        gen = StaticGenerator(manifest='/var/lib/staticgenerator.db')
+        gen.manifest.by_prefix('/blog/')
+
+    Huge QuerySets can be published lazily: paths are extracted while they
+    are being published, and QuerySets are read with .iterator() or, given a
+    chunk_size, chunk_size rows at a time in primary key order::
+
+        quick_publish(Post.objects.all(), lazy=True, chunk_size=1000)
+
+    QuerySets of models with a URL registered through register_url() only
+    fetch the columns their URLs are built from.
+
+    Directories are only checked for (and created) the first time a
+    generator writes to them. Pass share_directory_cache=True to share what
+    is known with every generator in the process.
+
+    To find out where a run spends its time, pass a Stats object (or any
+    object with the same record() and fail() methods)::
+
+        gen = StaticGenerator(Post.objects.all(), stats=Stats())
+        gen.publish()
+        print gen.stats.report()
+
+    profile=N additionally runs publish() or delete() under cProfile, then
+    prints the profile (or dumps it to profile_output) and the N slowest
+    paths.
+
+    Incremental rebuilds only publish the objects modified since the last
+    successful build (remembered in build_state), plus always_rebuild::
+
+        quick_publish(Post.objects.all(), incremental=True,
+                      modified_field='updated', always_rebuild=('/', '/feeds/'),
+                      build_state='/var/lib/example.com/builds.json')
+
+    track_dependencies=True records in the manifest which model instances
+    each page was rendered from; dependents(instance) then lists the pages
+    showing instance (see dependencies.py).
+
+    ttls=((r'^/news/', 300),) makes pages expire that many seconds after
+    they are published (the first matching pattern wins); refresher.py
+    republishes them before they do.
+
+    Pages at directory-style paths (ending with a /) are written to
+    index.html, or to the index file content_types (added to CONTENT_TYPES)
+    maps their response's media type to, such as index.json.
+    content_type_map='/etc/nginx/static-types.map' writes the content type
+    of every page that is not HTML there after publish(), for nginx to send
+    (see write_content_type_map).
+
+    variant_params=('page', 'sort') publishes /blog/?page=3&sort=new as a
+    variant of /blog/, to blog/index@page=3&sort=new.html;
+    variant_headers=('Accept-Language',) does the same for headers (see
+    variants.py).
+
+    render='fast' renders pages by calling their views directly, through the
+    render_middleware only rather than the whole middleware stack.
+
+    shard='3/16' only publishes the third of 16 slices of the paths, split by
+    a stable hash, so that 16 processes or hosts share a build (see
+    shards.py).
+
+    single_flight=True makes publish_once() skip pages another thread or
+    process is already writing (see locks.py); the middleware uses it.
+
     The reason for having all the optional parameters is to reduce coupling
     with django in order for more effectively unit testing.
     """
@@ -42,14 +234,22 @@ class StaticGenerator(object):
     def __init__(self, *resources, **kw):
         self.parse_dependencies(kw)
 
+        if self.incremental:
+            resources = tuple(resources) + tuple(self.always_rebuild)
         self.resources = self.extract_resources(resources)
         self.server_name = self.get_server_name()
 
+        if not self.render_engine:
+            self.render_engine = RenderEngine(self.http_request, self.server_name, self.get_handler())
+
         try:
             self.web_root = getattr(self.settings, 'WEB_ROOT')
         except AttributeError:
             raise StaticGeneratorException('You must specify WEB_ROOT in settings.py')
 
+        if self.single_flight and not self.locks:
+            self.locks = PathLocks(get_state_dir('locks', self.web_root))
+
     def parse_dependencies(self, kw):
         http_request = kw.get('http_request', None)
         model_base = kw.get('model_base', None)
@@ -59,6 +259,39 @@ class StaticGenerator(object):
         settings = kw.get('settings', None)
         site = kw.get('site', None)
         fs = kw.get('fs', None)
+        executor = kw.get('executor', None)
+        workers = kw.get('workers', None)
+        fail_silently = kw.get('fail_silently', False)
+        render_engine = kw.get('render_engine', None)
+        render = kw.get('render', None)
+        render_middleware = kw.get('render_middleware', None)
+        skip_unchanged = kw.get('skip_unchanged', None)
+        compress = kw.get('compress', None)
+        compress_level = kw.get('compress_level', None)
+        compress_min_size = kw.get('compress_min_size', None)
+        manifest = kw.get('manifest', None)
+        lazy = kw.get('lazy', None)
+        chunk_size = kw.get('chunk_size', None)
+        builders = kw.get('url_builders', None)
+        share_directory_cache = kw.get('share_directory_cache', None)
+        stats = kw.get('stats', None)
+        profile = kw.get('profile', None)
+        profile_output = kw.get('profile_output', None)
+        incremental = kw.get('incremental', None)
+        modified_field = kw.get('modified_field', None)
+        always_rebuild = kw.get('always_rebuild', None)
+        build_state = kw.get('build_state', None)
+        build_name = kw.get('build_name', 'default')
+        since = kw.get('since', None)
+        track_dependencies = kw.get('track_dependencies', None)
+        single_flight = kw.get('single_flight', None)
+        locks = kw.get('locks', None)
+        shard = kw.get('shard', None)
+        ttls = kw.get('ttls', None)
+        content_types = kw.get('content_types', None)
+        variant_params = kw.get('variant_params', None)
+        variant_headers = kw.get('variant_headers', None)
+        content_type_map = kw.get('content_type_map', None)
         
         self.http_request = http_request
         if not http_request:
@@ -96,20 +329,199 @@ class StaticGenerator(object):
 
         self.site = site
 
+        self.executor = executor
+        if not executor or isinstance(executor, basestring):
+            name = executor or getattr(self.settings, 'STATIC_GENERATOR_EXECUTOR', 'serial')
+            workers = workers or getattr(self.settings, 'STATIC_GENERATOR_WORKERS', None)
+            try:
+                self.executor = get_executor(name, workers)
+            except ValueError, err:
+                raise StaticGeneratorException(str(err))
+
+        self.fail_silently = fail_silently
+
+        self.skip_unchanged = skip_unchanged
+        if skip_unchanged is None:
+            self.skip_unchanged = getattr(self.settings, 'STATIC_GENERATOR_SKIP_UNCHANGED', False)
+
+        if compress is None:
+            compress = getattr(self.settings, 'STATIC_GENERATOR_COMPRESS', ())
+        self.compressors = get_compressors(compress)
+
+        self.compress_level = compress_level
+        if compress_level is None:
+            self.compress_level = getattr(self.settings, 'STATIC_GENERATOR_COMPRESS_LEVEL', None)
+
+        self.compress_min_size = compress_min_size
+        if compress_min_size is None:
+            self.compress_min_size = getattr(self.settings, 'STATIC_GENERATOR_COMPRESS_MIN_SIZE', 256)
+
+        if manifest is None:
+            manifest = getattr(self.settings, 'STATIC_GENERATOR_MANIFEST', None)
+        self.manifest = manifest
+        if isinstance(manifest, basestring):
+            self.manifest = Manifest(manifest)
+
+        self.lazy = lazy
+        if lazy is None:
+            self.lazy = getattr(self.settings, 'STATIC_GENERATOR_LAZY', False)
+
+        self.chunk_size = chunk_size
+        if chunk_size is None:
+            self.chunk_size = getattr(self.settings, 'STATIC_GENERATOR_CHUNK_SIZE', None)
+
+        self.url_builders = builders
+        if builders is None:
+            self.url_builders = url_builders
+
+        if share_directory_cache is None:
+            share_directory_cache = getattr(self.settings, 'STATIC_GENERATOR_SHARE_DIRECTORY_CACHE', False)
+        self.directories = set()
+        if share_directory_cache:
+            self.directories = known_directories
+
+        self.profile = profile
+        if profile is None:
+            self.profile = getattr(self.settings, 'STATIC_GENERATOR_PROFILE', None)
+        self.profile_output = profile_output
+
+        self.stats = stats
+        if self.profile and not stats:
+            self.stats = Stats()
+
+        self.incremental = incremental
+        if incremental is None:
+            self.incremental = getattr(self.settings, 'STATIC_GENERATOR_INCREMENTAL', False)
+
+        self.modified_field = modified_field
+        if modified_field is None:
+            self.modified_field = getattr(self.settings, 'STATIC_GENERATOR_MODIFIED_FIELD', 'modified')
+
+        self.always_rebuild = always_rebuild
+        if always_rebuild is None:
+            self.always_rebuild = getattr(self.settings, 'STATIC_GENERATOR_ALWAYS_REBUILD', ())
+
+        if build_state is None:
+            build_state = getattr(self.settings, 'STATIC_GENERATOR_BUILD_STATE', None)
+        self.build_state = build_state
+        if isinstance(build_state, basestring):
+            self.build_state = BuildState(build_state)
+        self.build_name = build_name
+
+        # Rows modified while this build runs are picked up by the next one
+        self.started = time.time()
+        self.since = since
+        if self.incremental and since is None:
+            if not self.build_state:
+                raise StaticGeneratorException('Incremental builds need STATIC_GENERATOR_BUILD_STATE in settings.py')
+            last_build = self.build_state.get(build_name)
+            if last_build is not None:
+                self.since = to_datetime(last_build, getattr(self.settings, 'USE_TZ', False))
+
+        self.track_dependencies = track_dependencies
+        if track_dependencies is None:
+            self.track_dependencies = getattr(self.settings, 'STATIC_GENERATOR_TRACK_DEPENDENCIES', False)
+        if self.track_dependencies:
+            if not self.manifest:
+                raise StaticGeneratorException('Tracking dependencies needs STATIC_GENERATOR_MANIFEST in settings.py')
+            dependencies.install()
+
+        if content_types is None:
+            content_types = getattr(self.settings, 'STATIC_GENERATOR_CONTENT_TYPES', {})
+        self.content_types = dict(CONTENT_TYPES, **content_types)
+
+        self.content_type_map = content_type_map
+        if content_type_map is None:
+            self.content_type_map = getattr(self.settings, 'STATIC_GENERATOR_CONTENT_TYPE_MAP', None)
+
+        if variant_params is None:
+            variant_params = getattr(self.settings, 'STATIC_GENERATOR_VARIANT_PARAMS', ())
+        if variant_headers is None:
+            variant_headers = getattr(self.settings, 'STATIC_GENERATOR_VARIANT_HEADERS', ())
+        self.variants = Variants(variant_params, variant_headers)
+
+        if ttls is None:
+            ttls = getattr(self.settings, 'STATIC_GENERATOR_TTLS', ())
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        if self.ttls and not self.manifest:
+            raise StaticGeneratorException('Page TTLs need STATIC_GENERATOR_MANIFEST in settings.py')
+        if self.content_type_map and not self.manifest:
+            raise StaticGeneratorException('The content type map needs STATIC_GENERATOR_MANIFEST in settings.py')
+
+        self.shard = None
+        if shard:
+            try:
+                self.shard = parse_shard(shard)
+            except ValueError, err:
+                raise StaticGeneratorException(str(err))
+
+        self.single_flight = single_flight
+        if single_flight is None:
+            self.single_flight = getattr(self.settings, 'STATIC_GENERATOR_SINGLE_FLIGHT', False)
+
+        # Lock files go to a local temporary directory unless one is given, see
+        # __init__
+        self.locks = locks
+        lock_dir = getattr(self.settings, 'STATIC_GENERATOR_LOCK_DIR', None)
+        if not locks and lock_dir:
+            self.locks = PathLocks(lock_dir)
+
+        # Built once the server name is known, see __init__
+        self.render_engine = render_engine
+
+        self.render_mode = render
+        if render is None:
+            self.render_mode = getattr(self.settings, 'STATIC_GENERATOR_RENDER', 'full')
+
+        self.render_middleware = render_middleware
+        if render_middleware is None:
+            self.render_middleware = getattr(self.settings, 'STATIC_GENERATOR_RENDER_MIDDLEWARE', ())
+
+    def get_handler(self):
+        """Returns the handler pages are rendered through, see handlers.get_handler"""
+        if self.render_mode == 'full':
+            # Looked up here so tests can replace it
+            return DummyHandler()
+        try:
+            return get_handler(self.render_mode, self.render_middleware)
+        except ValueError, err:
+            raise StaticGeneratorException(str(err))
+
     def extract_resources(self, resources):
-        """Takes a list of resources, and gets paths by type"""
-        extracted = []
+        """
+        Takes a list of resources, and gets paths by type. Lazy generators
+        get an iterable that extracts them on demand instead.
+        """
+        if self.lazy:
+            return LazyResources(self, resources)
+        with self.timer('extract', None):
+            return list(self.iter_paths(resources))
+
+    def iter_paths(self, resources):
+        """Yields the paths of resources, only those of its shard if any"""
+        paths = (self.get_canonical_path(path) for path in self.iter_resources(resources))
+        if not self.shard:
+            return paths
+        index, count = self.shard
+        return (path for path in paths if shard_of(path, count) == index)
 
+    def iter_resources(self, resources):
+        """Takes a list of resources, and yields paths by type"""
         for resource in resources:
 
+            # A URL already extracted with its source
+            if isinstance(resource, SourcedURL):
+                yield resource
+                continue
+
             # A URL string
             if isinstance(resource, (str, unicode, Promise)):
-                extracted.append(str(resource))
+                yield str(resource)
                 continue
 
             # A model instance; requires get_absolute_url method
             if isinstance(resource, self.model):
-                extracted.append(resource.get_absolute_url())
+                yield self.get_url_from_object(resource)
                 continue
 
             # If it's a Model, we get the base Manager
@@ -120,11 +532,81 @@ class StaticGenerator(object):
             if isinstance(resource, self.manager):
                 resource = resource.all()
 
-            # Append all paths from obj.get_absolute_url() to list
             if isinstance(resource, self.queryset):
-                extracted += [obj.get_absolute_url() for obj in resource]
+                if self.incremental and self.since is not None:
+                    resource = self.filter_modified(resource)
+
+                model = getattr(resource, 'model', None)
 
-        return extracted
+                # Yield all paths built from the registered columns
+                if model in self.url_builders:
+                    fields, builder = self.url_builders[model]
+                    values = resource.values_list('pk', *fields)
+                    for row in self.iter_queryset(values, itemgetter(0)):
+                        yield self.get_url_from_values(model, row, fields, builder)
+                    continue
+
+                # Yield all paths from obj.get_absolute_url()
+                for obj in self.iter_queryset(resource):
+                    yield self.get_url_from_object(obj)
+
+    def get_modified_field(self, model):
+        """
+        Returns the field telling when a model's rows were last modified.
+        modified_field is either one name for every model, or a dict of
+        names by model label ('blog.post').
+        """
+        if isinstance(self.modified_field, dict):
+            return self.modified_field.get(get_label(model))
+        return self.modified_field
+
+    def filter_modified(self, queryset):
+        """Narrows queryset down to the rows modified since the last build"""
+        field = self.get_modified_field(queryset.model)
+        if not field or not queryset.query.can_filter():
+            return queryset
+        return queryset.filter(**{'%s__gt' % field: self.since})
+
+    def iter_queryset(self, queryset, get_pk=attrgetter('pk')):
+        """
+        Iterates over a QuerySet. Lazy generators don't fill its result
+        cache, and read it in chunks when chunk_size is set.
+        """
+        if not self.lazy:
+            return iter(queryset)
+        if self.chunk_size and queryset.query.can_filter():
+            return self.iter_chunks(queryset, get_pk)
+        return queryset.iterator()
+
+    def iter_chunks(self, queryset, get_pk):
+        """Walks queryset in primary key order, chunk_size rows per query"""
+        queryset = queryset.order_by('pk')
+        chunk = queryset
+        while True:
+            objs = list(chunk[:self.chunk_size])
+            for obj in objs:
+                yield obj
+            if len(objs) < self.chunk_size:
+                return
+            chunk = queryset.filter(pk__gt=get_pk(objs[-1]))
+
+    def get_url_from_object(self, obj):
+        """Returns obj.get_absolute_url(), noting obj as its source"""
+        url = obj.get_absolute_url()
+        if self.manifest:
+            return SourcedURL(url, get_source(obj, obj.pk))
+        return url
+
+    def get_url_from_values(self, model, row, fields, builder):
+        """Builds a URL from a values_list row of (pk, field values...)"""
+        pk, values = row[0], row[1:]
+        if callable(builder):
+            url = builder(*values)
+        else:
+            url = builder % dict(zip(fields, values))
+        if self.manifest:
+            return SourcedURL(url, get_source(model, pk))
+        return url
 
     def get_server_name(self):
         '''Tries to get the server name.
@@ -146,90 +628,668 @@ class StaticGenerator(object):
             print '*** Warning ***: Using "localhost" for domain name. Use django.contrib.sites or set settings.SERVER_NAME to disable this warning.'
             return 'localhost'
 
-    def get_content_from_path(self, path):
+    def timer(self, phase, path):
+        """Returns a context manager timing phase for path into self.stats"""
+        if self.stats is None:
+            return NULL_TIMER
+        return self.stats.timer(phase, path)
+
+    def recording(self):
+        """Returns a context manager recording what a page is rendered from"""
+        if not self.track_dependencies:
+            return dependencies.NULL_RECORDING
+        return dependencies.Recording()
+
+    def dependents(self, instance):
+        """Returns the published paths that were rendered from instance"""
+        return self.manifest.dependents(*get_source(instance, instance.pk))
+
+    def get_response_from_path(self, path):
         """
-        Imitates a basic http request using DummyHandler to retrieve
-        resulting output (HTML, XML, whatever)
+        Imitates a basic http request using the render engine's DummyHandler
+        to retrieve the resulting response (HTML, XML, whatever). Only 200
+        responses are returned.
         """
+        with self.timer('render', path) as timer:
+            try:
+                with self.recording() as sources:
+                    if '?' in path:
+                        base, key = self.variants.split(path)
+                        response = self.render_engine.render(base, *self.variants.get_request(key))
+                    else:
+                        response = self.render_engine.render(path)
+            except Exception, err:
+                raise StaticGeneratorException("The requested page(\"%s\") raised an exception. Static Generation failed. Error: %s" % (path, str(err)))
 
-        request = self.http_request()
-        request.path_info = path
-        request.META.setdefault('SERVER_PORT', 80)
-        request.META.setdefault('SERVER_NAME', self.server_name)
+            if int(response.status_code) != 200:
+                raise StaticGeneratorException("The requested page(\"%s\") returned http code %d. Static Generation failed." % (path, int(response.status_code)),
+                                               status_code=int(response.status_code))
 
-        handler = DummyHandler()
-        try:
-            response = handler(request)
-        except Exception, err:
-            raise StaticGeneratorException("The requested page(\"%s\") raised an exception. Static Generation failed. Error: %s" % (path, str(err)))
+            if sources is not None:
+                self.manifest.set_dependencies(path, sources)
 
-        if int(response.status_code) != 200:
-            raise StaticGeneratorException("The requested page(\"%s\") returned http code %d. Static Generation failed." % (path, int(response.status_code)))
+            # The body of a streaming response is only rendered as it is read
+            if not getattr(response, 'streaming', False):
+                timer.size = len(response.content)
+            return response
 
+    def get_content_from_path(self, path):
+        """Returns the content of the page at path, see get_response_from_path"""
+        response = self.get_response_from_path(path)
+        if getattr(response, 'streaming', False):
+            try:
+                return ''.join(response.streaming_content)
+            finally:
+                response.close()
         return response.content
 
-    def get_filename_from_path(self, path):
+    def get_index_name(self, content_type=None):
+        """
+        Returns the file name of directory-style paths (ending with a /) for
+        a response's content type; index.html unless content_types maps it.
+        """
+        if not content_type:
+            return 'index.html'
+        media_type = content_type.split(';')[0].strip().lower()
+        return self.content_types.get(media_type, 'index.html')
+
+    def get_filename_from_path(self, path, content_type=None):
         """
         Returns (filename, directory)
-        Creates index.html for path if necessary
+        Creates index.html (or the index file of content_type) for path if
+        necessary. Paths of variants (/blog/?page=3) get the variant's key
+        in their file name, see variants.Variants.get_filename.
         """
+        path, key = self.variants.split(path)
         if path.endswith('/'):
-            path = '%sindex.html' % path
+            path = '%s%s' % (path, self.get_index_name(content_type))
 
         filename = self.fs.join(self.web_root, path.lstrip('/')).encode('utf-8')
+        if key:
+            filename = self.variants.get_filename(filename, key)
         return filename, self.fs.dirname(filename)
 
-    def publish_from_path(self, path, content=None):
+    def get_filenames_from_path(self, path):
+        """Returns every filename path may have been published as"""
+        base, key = self.variants.split(path)
+        if not base.endswith('/'):
+            return [self.get_filename_from_path(path)[0]]
+        names = ['index.html'] + sorted(set(self.content_types.values()) - set(['index.html']))
+        query = key and '?' + key
+        return [self.get_filename_from_path(base + name + query)[0] for name in names]
+
+    def get_canonical_path(self, path):
         """
-        Gets filename and content for a path, attempts to create directory if 
-        necessary, writes to file.
+        Returns path with the key of its variant normalized, so that
+        /blog/?sort=new&page=3 and /blog/?page=3&sort=new are one page
         """
-        filename, directory = self.get_filename_from_path(path)
-        if not content:
-            content = self.get_content_from_path(path)
+        if '?' not in path:
+            return path
+        base, key = self.variants.split(path)
+        canonical = key and '%s?%s' % (base, key) or base
+        if isinstance(path, SourcedURL):
+            return SourcedURL(canonical, path.source)
+        return canonical
+
+    def get_variant_path(self, path, query_string, meta):
+        """
+        Returns the path a request is published at: path, or path?key for a
+        variant (see variants.Variants). Returns None for requests whose
+        query string has parameters that do not select a variant.
+        """
+        if not self.variants:
+            return None if query_string else path
+        key = self.variants.get_request_key(query_string, meta)
+        if key is None:
+            return None
+        return key and '%s?%s' % (path, key) or path
+
+    def get_digest(self, content):
+        return hashlib.md5(content).hexdigest()
+
+    def is_unchanged(self, path, filename, size, digest):
+        """
+        Returns True if filename already holds exactly the size bytes whose
+        digest is given. The digest stored in the manifest is trusted when
+        there is one, otherwise the file is read back.
+        """
+        try:
+            if self.fs.getsize(filename) != size:
+                return False
+            entry = self.manifest and self.manifest.get(path)
+            if entry and entry.filename == to_unicode(filename) and entry.size == size:
+                return entry.digest == digest
+            return self.fs.digest(filename) == digest
+        except (OSError, IOError):
+            return False
+
+    def has_sidecars(self, filename, size):
+        """Returns True if every sidecar a page of size bytes calls for is on disk"""
+        if size < self.compress_min_size:
+            return True
+        for compressor in self.compressors:
+            if not self.fs.exists(filename + compressor.extension):
+                return False
+        return True
+
+    def ensure_directory(self, directory):
+        """Creates directory unless it is already known to exist"""
+        if directory in self.directories:
+            return
 
         if not self.fs.exists(directory):
             try:
                 self.fs.makedirs(directory)
+            except OSError, err:
+                # Someone else created it in the meantime
+                if err.errno != errno.EEXIST:
+                    raise StaticGeneratorException('Could not create the directory: %s' % directory)
             except:
                 raise StaticGeneratorException('Could not create the directory: %s' % directory)
 
+        self.directories.add(directory)
+
+    def create_tempfile(self, directory):
         try:
-            f, tmpname = self.fs.tempfile(directory=directory)
-            self.fs.write(f, content)
-            self.fs.close(f)
-            self.fs.chmod(tmpname, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
-            self.fs.rename(tmpname, filename)
+            return self.fs.tempfile(directory=directory)
+        except OSError, err:
+            # The directory was known to exist but has been removed since,
+            # by another generator or process
+            if err.errno != errno.ENOENT or directory not in self.directories:
+                raise
+        self.directories.discard(directory)
+        self.ensure_directory(directory)
+        return self.fs.tempfile(directory=directory)
+
+    def write_file(self, filename, directory, content):
+        """Writes content to a temporary file, then renames it to filename"""
+        f, tmpname = self.create_tempfile(directory)
+        self.fs.write(f, content)
+        self.fs.close(f)
+        self.rename_tempfile(tmpname, filename)
+
+    def rename_tempfile(self, tmpname, filename):
+        self.fs.chmod(tmpname, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+        self.fs.rename(tmpname, filename)
+
+    def publish_sidecars(self, filename, directory, content):
+        """
+        Writes a compressed copy of content next to filename for every
+        configured compressor. Content smaller than compress_min_size is not
+        worth compressing, and any sidecar left from a bigger version of the
+        page is removed instead, as are the sidecars of compressors this
+        generator does not use, which would be stale copies.
+        """
+        for compressor in self.compressors:
+            sidecar = filename + compressor.extension
+            try:
+                if len(content) < self.compress_min_size:
+                    if self.fs.exists(sidecar):
+                        self.fs.remove(sidecar)
+                else:
+                    self.write_file(sidecar, directory, compressor.compress(content, self.compress_level))
+            except:
+                raise StaticGeneratorException('Could not create the file: %s' % sidecar)
+
+    def publish_from_path(self, path, content=None, content_type=None):
+        """
+        Gets filename and content for a path, attempts to create directory if 
+        necessary, writes to file. The filename of directory-style paths
+        depends on content_type, see get_index_name.
+
+        Returns True if the file was written, False if it was skipped because
+        its content did not change (see skip_unchanged).
+        """
+        if content is None:
+            return self.publish_response(path, self.get_response_from_path(path))
+        return self.publish_content(path, content, content_type)
+
+    def publish_content(self, path, content, content_type=None):
+        """Writes content, which may be empty, to the file of path"""
+        filename, directory = self.get_filename_from_path(path, content_type)
+
+        with self.timer('write', path) as timer:
+            timer.size = len(content)
+            return self.write_content(path, filename, directory, content, content_type)
+
+    def publish_response(self, path, response):
+        """
+        Publishes a rendered response at path. The body of a streaming
+        response is written as it is produced, see stream_content.
+        """
+        content_type = response.get('Content-Type', None)
+        if not getattr(response, 'streaming', False):
+            return self.publish_content(path, response.content, content_type)
+
+        filename, directory = self.get_filename_from_path(path, content_type)
+        with self.timer('write', path) as timer:
+            try:
+                written, timer.size = self.stream_content(path, filename, directory,
+                                                          response.streaming_content, content_type)
+            finally:
+                response.close()
+            return written
+
+    def publish_once(self, path, content=None, content_type=None):
+        """
+        Publishes path unless another thread or process on this host is
+        already writing it, or it was written since it was last deleted.
+
+        Returns True if this call wrote the file.
+        """
+        if not self.locks.acquire(path):
+            return False
+        try:
+            for filename in self.get_filenames_from_path(path):
+                if self.fs.exists(filename):
+                    return False
+            return self.publish_from_path(path, content, content_type)
+        finally:
+            self.locks.release(path)
+
+    def write_content(self, path, filename, directory, content, content_type=None):
+        digest = None
+        if self.skip_unchanged or self.manifest:
+            digest = self.get_digest(content)
+
+        expires = self.get_expires(path)
+        if self.skip_unchanged and self.is_unchanged(path, filename, len(content), digest) \
+                and self.has_sidecars(filename, len(content)):
+            if expires is not None:
+                self.manifest.set_expires(path, expires)
+            return False
+
+        self.ensure_directory(directory)
+
+        # Sidecars first, so the page is never served next to the compressed
+        # copies of its previous version
+        self.publish_sidecars(filename, directory, content)
+
+        try:
+            self.write_file(filename, directory, content)
         except:
             raise StaticGeneratorException('Could not create the file: %s' % filename)
 
+        self.remove_other_index_files(path, filename)
+
+        if self.manifest:
+            self.manifest.record(path, filename, len(content), digest, getattr(path, 'source', None), expires,
+                                 content_type)
+        return True
+
+    def stream_content(self, path, filename, directory, chunks, content_type=None):
+        """
+        Writes the chunks of a page one at a time to a temporary file, and
+        to one temporary file per compressor, so that only a chunk is ever
+        held in memory. The files are renamed into place once the last chunk
+        is written, like write_content's.
+
+        Returns (written, size) where written is False if the page was
+        skipped because its content did not change (see skip_unchanged).
+        """
+        self.ensure_directory(directory)
+        md5 = hashlib.md5()
+        size = 0
+        tempfiles = []
+        try:
+            try:
+                tempfiles.append((filename, None) + self.create_tempfile(directory))
+                for compressor in self.compressors:
+                    tempfiles.append((filename + compressor.extension,
+                                      compressor.compressobj(self.compress_level)) + self.create_tempfile(directory))
+
+                for chunk in chunks:
+                    md5.update(chunk)
+                    size += len(chunk)
+                    for name, compressobj, f, tmpname in tempfiles:
+                        self.fs.write(f, compressobj.compress(chunk) if compressobj else chunk)
+                for name, compressobj, f, tmpname in tempfiles:
+                    if compressobj:
+                        self.fs.write(f, compressobj.flush())
+            finally:
+                for name, compressobj, f, tmpname in tempfiles:
+                    self.fs.close(f)
+        except Exception, err:
+            for name, compressobj, f, tmpname in tempfiles:
+                self.fs.remove(tmpname)
+            raise StaticGeneratorException('Could not create the file: %s. Error: %s' % (filename, err))
+
+        digest = md5.hexdigest()
+        expires = self.get_expires(path)
+        if self.skip_unchanged and self.is_unchanged(path, filename, size, digest) \
+                and self.has_sidecars(filename, size):
+            for name, compressobj, f, tmpname in tempfiles:
+                self.fs.remove(tmpname)
+            if expires is not None:
+                self.manifest.set_expires(path, expires)
+            return False, size
+
+        # Sidecars first, as in write_content
+        for name, compressobj, f, tmpname in tempfiles[1:] + tempfiles[:1]:
+            try:
+                if compressobj and size < self.compress_min_size:
+                    self.fs.remove(tmpname)
+                    if self.fs.exists(name):
+                        self.fs.remove(name)
+                else:
+                    self.rename_tempfile(tmpname, name)
+            except:
+                raise StaticGeneratorException('Could not create the file: %s' % name)
+        self.remove_other_index_files(path, filename)
+
+        if self.manifest:
+            self.manifest.record(path, filename, size, digest, getattr(path, 'source', None), expires,
+                                 content_type)
+        return True, size
+
+    def get_expires(self, path):
+        """Returns when the page at path expires, None if it never does"""
+        for regex, ttl in self.ttls:
+            if regex.search(path):
+                return time.time() + ttl
+        return None
+
     def delete_from_path(self, path):
-        """Deletes file, attempts to delete directory"""
+        """Deletes file and its sidecars, attempts to delete directory"""
+        with self.timer('delete', path):
+            self.delete_files(path)
+
+    def delete_files(self, path):
         filename, directory = self.get_filename_from_path(path)
-        try:
-            if self.fs.exists(filename):
-                self.fs.remove(filename)
-        except:
-            raise StaticGeneratorException('Could not delete file: %s' % filename)
+        filenames = [filename]
+        if self.variants.split(path)[0].endswith('/'):
+            filenames = self.get_filenames_from_path(path)
+        self.remove_files(filenames)
+
+        if self.manifest:
+            self.manifest.remove(path)
 
         try:
             self.fs.rmdir(directory)
+            self.directories.discard(directory)
         except OSError:
             # Will fail if a directory is not empty, in which case we don't 
             # want to delete it anyway
             pass
 
+    def remove_files(self, filenames):
+        """
+        Removes filenames and their sidecars, those that exist. Sidecars of
+        every compressor are removed, whichever this generator uses.
+        """
+        for name in [filename + extension
+                     for filename in filenames
+                     for extension in [''] + SIDECAR_EXTENSIONS]:
+            try:
+                if self.fs.exists(name):
+                    self.fs.remove(name)
+            except:
+                raise StaticGeneratorException('Could not delete file: %s' % name)
+
+    def remove_other_index_files(self, path, filename):
+        """
+        Removes the index files a directory-style path was published to
+        with another content type, which a front-end could serve instead of
+        filename. The manifest tells which file that was; without an entry
+        the directory is listed once rather than every name checked.
+        """
+        if not self.variants.split(path)[0].endswith('/'):
+            return
+        entry = self.manifest and self.manifest.get(path)
+        if entry:
+            if entry.filename != to_unicode(filename):
+                self.remove_files([entry.filename.encode('utf-8')])
+            return
+
+        directory = self.fs.dirname(filename)
+        others = set(name for name in self.get_filenames_from_path(path) if name != filename)
+        stale = []
+        for name, is_directory in self.fs.scandir(directory):
+            base = name
+            for extension in SIDECAR_EXTENSIONS:
+                if base.endswith(extension):
+                    base = base[:-len(extension)]
+                    break
+            if not is_directory and self.fs.join(directory, base) in others:
+                stale.append(self.fs.join(directory, name))
+        for name in stale:
+            try:
+                self.fs.remove(name)
+            except OSError, err:
+                if err.errno != errno.ENOENT:
+                    raise StaticGeneratorException('Could not delete file: %s' % name)
+
+    def purge(self, prefix=None, pattern=None):
+        """
+        Deletes every published page (sidecars included) whose path starts
+        with prefix and matches the glob pattern, walking the directory tree
+        once rather than checking path by path. Directories left empty are
+        removed in the same bottom-up pass, and so are their empty ancestors.
+
+        Returns Purged(paths, files, directories) counts.
+        """
+        if prefix is None and pattern is None:
+            raise StaticGeneratorException('Give a prefix or a pattern to purge')
+        prefix = to_unicode(prefix or '/')
+
+        top = self.fs.join(self.web_root, prefix.lstrip('/')).encode('utf-8')
+        if not prefix.endswith('/'):
+            top = self.fs.dirname(top)
+
+        paths = set()
+        counts = [0, 0]
+        with self.timer('delete', prefix):
+            if self.fs.exists(top):
+                self.purge_directory(top, prefix, pattern, paths, counts)
+
+            directory = self.fs.dirname(top.rstrip('/'))
+            while directory.startswith(self.web_root) and directory.rstrip('/') != self.web_root.rstrip('/'):
+                try:
+                    self.fs.rmdir(directory)
+                except OSError:
+                    break
+                self.directories.discard(directory)
+                counts[1] += 1
+                directory = self.fs.dirname(directory)
+
+            if self.manifest and paths:
+                self.manifest.remove_many(paths)
+
+        return Purged(len(paths), counts[0], counts[1])
+
+    def purge_directory(self, directory, prefix, pattern, paths, counts):
+        """
+        Removes the matching files under directory, then directory itself if
+        that left it empty. Returns True if it was removed.
+        """
+        entries = self.fs.scandir(directory)
+        remaining = len(entries)
+        for name, is_directory in entries:
+            # Lock files and checkpoints are not pages
+            if name.startswith('.staticgenerator'):
+                continue
+
+            filename = self.fs.join(directory, name)
+            path = self.get_path_from_filename(filename)
+
+            if is_directory:
+                path += '/'
+                if not (path.startswith(prefix) or prefix.startswith(path)):
+                    continue
+                if self.purge_directory(filename, prefix, pattern, paths, counts):
+                    remaining -= 1
+                continue
+
+            if not path.startswith(prefix) or pattern and not fnmatch(path, pattern):
+                continue
+            try:
+                self.fs.remove(filename)
+                counts[0] += 1
+            except OSError, err:
+                # Deleted meanwhile, by a delete, the refresher or another purge
+                if err.errno != errno.ENOENT:
+                    raise StaticGeneratorException('Could not delete file: %s' % filename)
+            paths.add(path)
+            remaining -= 1
+
+        if remaining or directory.rstrip('/') == self.web_root.rstrip('/'):
+            return False
+        try:
+            self.fs.rmdir(directory)
+        except OSError, err:
+            # A page was written into it meanwhile, or it was removed already
+            if err.errno != errno.ENOENT:
+                return False
+        else:
+            counts[1] += 1
+        self.directories.discard(directory)
+        return True
+
+    def get_path_from_filename(self, filename):
+        """Returns the URL path a file (or one of its sidecars) was published for"""
+        filename = to_unicode(filename)
+        for compressor in COMPRESSORS.values():
+            if filename.endswith(compressor.extension):
+                filename = filename[:-len(compressor.extension)]
+                break
+        directory, name = filename[len(to_unicode(self.web_root).rstrip('/')):].rsplit('/', 1)
+        name, key = self.variants.parse_filename(name)
+        if key and '=' not in key and self.manifest:
+            # The key was hashed; the manifest knows which variant it stands for
+            entry = self.manifest.by_filename(filename)
+            if entry:
+                return entry.path
+        if name == 'index.html' or name in self.content_types.values():
+            name = ''
+        path = '%s/%s' % (directory, name)
+        return key and '%s?%s' % (path, key) or path
+
     def do_all(self, func):
-        return [func(path) for path in self.resources]
+        """
+        Runs func against every resource path using the configured executor.
+        Returns the Outcome of each path, in order. Unless fail_silently is
+        set, the first failing path raises its exception.
+        """
+        if self.profile:
+            return self.profile_all(func)
+
+        paths = self.resources
+        if self.lazy and self.stats is not None:
+            paths = self.iter_timed(paths)
+
+        results = Results(keep=not self.lazy)
+        outcomes = self.executor.imap(func, paths)
+        try:
+            for outcome in outcomes:
+                self.add_outcome(results, outcome)
+        finally:
+            # Stops the pool, rather than leaving it to run the rest of the
+            # batch, when a failing path raises
+            outcomes.close()
+        return results
+
+    def add_outcome(self, results, outcome):
+        """Adds outcome to results; raises its error unless fail_silently"""
+        if not outcome.ok:
+            if self.stats is not None:
+                self.stats.fail(outcome.path, outcome.error)
+            if not self.fail_silently:
+                raise outcome.error
+        results.add(outcome)
+
+    def iter_timed(self, paths):
+        """Times the extraction of each path of a lazy generator"""
+        paths = iter(paths)
+        while True:
+            start = default_timer()
+            try:
+                path = next(paths)
+            except StopIteration:
+                return
+            self.stats.record('extract', path, default_timer() - start)
+            yield path
+
+    def profile_all(self, func):
+        """
+        Runs do_all under cProfile, then reports the profile and the slowest
+        paths. cProfile only sees the calling thread: use the serial executor
+        to profile rendering and writing.
+        """
+        profile, self.profile = self.profile, None
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(self.do_all, func)
+        finally:
+            self.profile = profile
+            if self.profile_output:
+                profiler.dump_stats(self.profile_output)
+            else:
+                pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(30)
+            print self.stats.report(profile is True and 10 or int(profile))
 
     def delete(self):
         return self.do_all(self.delete_from_path)
 
     def publish(self):
-        return self.do_all(self.publish_from_path)
+        results = self.do_all(self.publish_from_path)
+        if self.incremental and not results.failed:
+            self.build_state.set(self.build_name, self.started)
+        if self.content_type_map:
+            self.write_content_type_map()
+        return results
+
+    def write_content_type_map(self, filename=None):
+        """
+        Writes the content type of every published page that is not HTML,
+        from the manifest, as the body of an nginx map block:
+
+            "/feed" "application/rss+xml; charset=utf-8";
+
+        Returns the number of pages written.
+        """
+        filename = filename or self.content_type_map
+        lines = []
+        for entry in self.manifest.all():
+            if entry.content_type and not entry.content_type.startswith('text/html'):
+                lines.append(u'"%s" "%s";\n' % (escape_map_value(entry.path), escape_map_value(entry.content_type)))
+        directory = self.fs.dirname(filename)
+        self.ensure_directory(directory)
+        self.write_file(filename, directory, u''.join(lines).encode('utf-8'))
+        return len(lines)
 
-def quick_publish(*resources):
-    return StaticGenerator(*resources).publish()
+    def crawl(self, max_depth=None, prefixes=None, exclude=None):
+        """
+        Publishes the resources and every page reachable from them through
+        same-site links, see crawler.Crawler.
+        """
+        if max_depth is None:
+            max_depth = getattr(self.settings, 'STATIC_GENERATOR_CRAWL_DEPTH', None)
+        if prefixes is None:
+            prefixes = getattr(self.settings, 'STATIC_GENERATOR_CRAWL_PREFIXES', ('/',))
+        if exclude is None:
+            exclude = getattr(self.settings, 'STATIC_GENERATOR_CRAWL_EXCLUDE', ())
+        return Crawler(self, max_depth, prefixes, exclude).crawl(self.resources, Results(keep=not self.lazy))
+
+def escape_map_value(value):
+    """Quotes value for a string in an nginx configuration file"""
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+def quick_publish(*resources, **kw):
+    return StaticGenerator(*resources, **kw).publish()
+
+def quick_delete(*resources, **kw):
+    """
+    Deletes the pages of resources. With prefix and/or pattern, every page
+    they match is purged too, and the Purged counts are returned instead.
+    """
+    gen = StaticGenerator(*resources, **kw)
+    prefix, pattern = kw.get('prefix', None), kw.get('pattern', None)
+    if prefix is None and pattern is None:
+        return gen.delete()
+    gen.delete()
+    return gen.purge(prefix, pattern)
 
-def quick_delete(*resources):
-    return StaticGenerator(*resources).delete()
+def quick_crawl(*resources, **kw):
+    return StaticGenerator(*resources, **kw).crawl(kw.get('max_depth', None),
+                                                   kw.get('prefixes', None),
+                                                   kw.get('exclude', None))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Remembering which paths a long build has done, so it can be resumed."""
+import errno
+import os
+
+from manifest import to_unicode
+
+
+class Checkpoint(object):
+    """
+    A file listing the paths a build has completed, one per line. Each path
+    is flushed as soon as it is added, so a build that crashes or is
+    interrupted loses at most the pages it was writing.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.done = self.load()
+        self.file = None
+
+    def load(self):
+        try:
+            f = open(self.filename, 'r+')
+        except IOError:
+            return set()
+        try:
+            lines = f.read().split('\n')
+            # A crash can leave the last line half written: it is dropped
+            # rather than trusted, and truncated so appending starts afresh
+            if lines[-1]:
+                f.truncate(f.tell() - len(lines[-1]))
+            return set(line.decode('utf-8') for line in lines[:-1])
+        finally:
+            f.close()
+
+    def __contains__(self, path):
+        return to_unicode(path) in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def filter(self, paths):
+        """Yields the paths that are not done yet"""
+        for path in paths:
+            if path not in self:
+                yield path
+
+    def add(self, path):
+        path = to_unicode(path)
+        self.done.add(path)
+        if self.file is None:
+            self.file = self.open()
+        self.file.write(path.encode('utf-8') + '\n')
+        self.file.flush()
+
+    def open(self):
+        directory = os.path.dirname(self.filename)
+        if directory:
+            try:
+                os.makedirs(directory)
+            except OSError, err:
+                if err.errno != errno.EEXIST:
+                    raise
+        return open(self.filename, 'a')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """Forgets every done path, for the next build to start over"""
+        self.close()
+        self.done = set()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Precompressed sidecars (index.html.gz, index.html.br) for front-ends that
+serve them directly, like nginx's gzip_static and brotli_static.
+"""
+import gzip
+import zlib
+from cStringIO import StringIO
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def gzip_compress(content, level):
+    buf = StringIO()
+    # mtime=0 keeps the output stable, so unchanged pages give identical files
+    f = gzip.GzipFile(filename='', mode='wb', compresslevel=level, fileobj=buf, mtime=0)
+    try:
+        f.write(content)
+    finally:
+        f.close()
+    return buf.getvalue()
+
+def brotli_compress(content, level):
+    return brotli.compress(content, quality=level)
+
+def gzip_compressobj(level):
+    # wbits 16 + 15 writes a gzip header, with no name and an mtime of 0
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+class BrotliCompressObj(object):
+    """brotli.Compressor with the compress()/flush() interface of zlib's"""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk):
+        return self.compressor.process(chunk)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class Compressor(object):
+    def __init__(self, name, extension, func, default_level, compressobj):
+        self.name = name
+        self.extension = extension
+        self.func = func
+        self.default_level = default_level
+        self.compressobj_class = compressobj
+
+    def compress(self, content, level=None):
+        if level is None:
+            level = self.default_level
+        return self.func(content, level)
+
+    def compressobj(self, level=None):
+        """
+        Returns an object compressing content a chunk at a time: pass every
+        chunk to compress(), then call flush() once, like zlib's.
+        """
+        if level is None:
+            level = self.default_level
+        return self.compressobj_class(level)
+
+COMPRESSORS = {
+    'gzip': Compressor('gzip', '.gz', gzip_compress, 9, gzip_compressobj),
+    'brotli': Compressor('brotli', '.br', brotli_compress, 11, BrotliCompressObj),
+}
+
+def is_available(name):
+    return name != 'brotli' or brotli is not None
+
+def get_compressors(names):
+    """
+    Returns the Compressors for the given names. Brotli is silently left out
+    when the brotli module is not installed.
+    """
+    compressors = []
+    for name in names or ():
+        if name not in COMPRESSORS:
+            raise ValueError('Unknown compression "%s". Choose one of: %s' % (name, ', '.join(sorted(COMPRESSORS))))
+        if is_available(name):
+            compressors.append(COMPRESSORS[name])
+    return compressors
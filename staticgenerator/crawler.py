@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Publishing a whole site by following its links.
+
+Starting from seed paths, each page is rendered and published, and the
+same-site links in its HTML become the next level of pages to crawl, until
+no new page is found or the depth limit is reached.
+"""
+import urllib
+from HTMLParser import HTMLParser, HTMLParseError
+from urlparse import urljoin, urlsplit
+
+from manifest import to_unicode
+
+
+class LinkParser(HTMLParser):
+    """Collects the href of <a>, <area> and <link rel="alternate"> tags"""
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and 'alternate' not in (attrs.get('rel') or '').lower().split():
+            return
+        if tag in ('a', 'area', 'link') and attrs.get('href'):
+            self.links.append(attrs['href'])
+
+def extract_links(content, path, hosts):
+    """
+    Returns the paths content (the page at path) links to on hosts, in
+    order. Links with a query string are left out, they can't be published
+    as files, and so are links climbing out of the site with '..'.
+    """
+    parser = LinkParser()
+    try:
+        parser.feed(content)
+        parser.close()
+    except (HTMLParseError, UnicodeDecodeError):
+        pass
+
+    base = 'http://%s%s' % (hosts[0], path)
+    links = []
+    for href in parser.links:
+        scheme, netloc, link, query, fragment = urlsplit(urljoin(base, href.strip()))
+        if scheme not in ('http', 'https') or query:
+            continue
+        if netloc.split(':')[0].lower() not in hosts:
+            continue
+        try:
+            link = to_unicode(urllib.unquote(link)) or u'/'
+        except UnicodeDecodeError:
+            continue
+        if set(link.split('/')) & set(['.', '..']):
+            continue
+        links.append(link)
+    return links
+
+
+class Crawler(object):
+    """
+    Publishes pages breadth first, a level at a time, on the generator's
+    executor. Each path is rendered and published once.
+
+    max_depth limits how many links away from the seeds pages are followed
+    (None for no limit). Only paths starting with one of prefixes and none
+    of exclude are crawled; seeds are always published.
+    """
+
+    def __init__(self, generator, max_depth=None, prefixes=('/',), exclude=(), hosts=None):
+        self.generator = generator
+        self.max_depth = max_depth
+        self.prefixes = tuple(prefixes)
+        self.exclude = tuple(exclude)
+        self.hosts = tuple(host.lower() for host in hosts or (generator.server_name,))
+
+    def follows(self, path):
+        return path.startswith(self.prefixes) and not (self.exclude and path.startswith(self.exclude))
+
+    def crawl_path(self, path):
+        """Renders and publishes path; returns (written, links)"""
+        response = self.generator.get_response_from_path(path)
+        links = []
+        if not getattr(response, 'streaming', False) \
+                and self.generator.get_index_name(response.get('Content-Type', None)) == 'index.html':
+            links = extract_links(response.content, path, self.hosts)
+        return self.generator.publish_response(path, response), links
+
+    def crawl(self, seeds, results):
+        """Crawls from seeds, adding the Outcome of every page to results"""
+        level = []
+        seen = set()
+        for path in seeds:
+            if path not in seen:
+                seen.add(path)
+                level.append(path)
+
+        depth = 0
+        while level:
+            follow = self.max_depth is None or depth < self.max_depth
+            next_level = []
+            for outcome in self.generator.executor.imap(self.crawl_path, level):
+                if outcome.ok:
+                    outcome.value, links = outcome.value
+                    for link in follow and links or ():
+                        if link not in seen and self.follows(link):
+                            seen.add(link)
+                            next_level.append(link)
+                self.generator.add_outcome(results, outcome)
+            level = next_level
+            depth += 1
+        return results
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Tracking which model instances each page was rendered from.
+
+While a page renders, every model instance Django loads (the post_init
+signal fires for each row a QuerySet turns into an object) is recorded
+against the page's path in the manifest. When an instance changes, its
+dependents are then exactly the pages that displayed it.
+
+Loading rows is not the only way a page can depend on data, so views and
+templates can add to the record with depends_on().
+"""
+import threading
+
+from manifest import ANY, get_label, get_source
+
+_local = threading.local()
+
+
+def _instance_loaded(sender, instance, **kw):
+    sources = getattr(_local, 'sources', None)
+    if sources is not None and instance.pk is not None:
+        sources.add(get_source(instance, instance.pk))
+
+def install():
+    """Connects the post_init receiver recording instances as they are loaded"""
+    from django.db.models.signals import post_init
+    post_init.connect(_instance_loaded, dispatch_uid='staticgenerator.dependencies')
+
+def start():
+    """Starts recording the dependencies of the page rendered by this thread"""
+    _local.sources = set()
+
+def stop():
+    """Stops recording and returns the set of (model label, pk) recorded"""
+    sources = getattr(_local, 'sources', None)
+    _local.sources = None
+    return sources or set()
+
+def depends_on(*objects):
+    """
+    Records dependencies loading instances does not reveal. Pass instances
+    read through values() or aggregates, or a model class for pages listing
+    its rows, so that rows that did not exist yet invalidate them too.
+    """
+    sources = getattr(_local, 'sources', None)
+    if sources is None:
+        return
+    for obj in objects:
+        if isinstance(obj, type):
+            sources.add((get_label(obj), ANY))
+        else:
+            sources.add(get_source(obj, obj.pk))
+
+
+class Recording(object):
+    """Records dependencies for the duration of a with block"""
+
+    def __enter__(self):
+        start()
+        self.sources = _local.sources
+        return self.sources
+
+    def __exit__(self, *exc_info):
+        stop()
+        return False
+
+class NullRecording(object):
+    """Stands in for Recording when dependencies are not tracked"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_RECORDING = NullRecording()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Executors used by StaticGenerator.do_all to run a function over many paths.
+
+Every executor exposes ``imap(func, paths)`` which yields one Outcome per
+path, in the same order the paths were given. Paths are consumed lazily, a
+batch at a time, so they can come from a generator of any length. Callers
+that stop early should close() the generator, which stops the workers.
+"""
+from functools import partial
+from itertools import islice
+from multiprocessing import cpu_count
+from multiprocessing.pool import Pool, ThreadPool
+
+
+class Outcome(object):
+    """The result (or the error) of running a function against one path"""
+
+    def __init__(self, path, value=None, error=None):
+        self.path = path
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return '<Outcome %s: %r>' % (self.path, self.value)
+        return '<Outcome %s: error %r>' % (self.path, self.error)
+
+
+def batches(paths, size):
+    """Yields lists of at most size paths"""
+    paths = iter(paths)
+    while True:
+        batch = list(islice(paths, size))
+        if not batch:
+            return
+        yield batch
+
+def run(func, path):
+    """Calls func(path), capturing any exception in the returned Outcome"""
+    try:
+        return Outcome(path, value=func(path))
+    except Exception, err:
+        return Outcome(path, error=err)
+
+
+class SerialExecutor(object):
+    """Runs every path in the calling thread, one after the other"""
+
+    def __init__(self, workers=None):
+        self.workers = 1
+
+    def imap(self, func, paths):
+        for path in paths:
+            yield run(func, path)
+
+
+class ThreadExecutor(object):
+    """Runs paths on a pool of threads; good for I/O bound rendering"""
+
+    pool_class = ThreadPool
+
+    # Paths handed to the pool at once, per worker. Pool.imap would otherwise
+    # read every path up front.
+    batch_size = 32
+
+    def __init__(self, workers=None):
+        self.workers = int(workers or cpu_count())
+
+    def create_pool(self):
+        return self.pool_class(self.workers)
+
+    def get_task(self, func):
+        return partial(run, func)
+
+    def imap(self, func, paths):
+        """
+        Yields the Outcome of each path. Closing the generator early (or an
+        exception in the consumer) terminates the pool: paths of the current
+        batch that have not started are dropped, and the running ones are
+        waited for.
+        """
+        task = self.get_task(func)
+        pool = self.create_pool()
+        completed = False
+        try:
+            for batch in batches(paths, self.workers * self.batch_size):
+                for outcome in pool.imap(task, batch):
+                    yield outcome
+            completed = True
+        finally:
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+
+# The function a ProcessExecutor is currently running. Worker processes are
+# forked after it is set, so they inherit it instead of having to unpickle
+# the generator (and its settings, file system, handler...) for every path.
+_task = None
+
+def _run_task(path):
+    return run(_task, path)
+
+def close_connections():
+    """
+    Closes Django's database connections. A forked process must not use the
+    connections of its parent: both would talk over the same socket.
+    """
+    from django.conf import settings
+    if not settings.configured:
+        return
+    from django.db import connections
+    connections.close_all()
+
+class ProcessExecutor(ThreadExecutor):
+    """
+    Runs paths on a pool of forked processes; good for CPU bound rendering.
+
+    Only the paths and the Outcomes cross process boundaries. Any state the
+    function keeps on its instance (caches, counters) stays in the workers.
+    Each worker opens its own database connections.
+    """
+
+    pool_class = Pool
+
+    def create_pool(self):
+        # Closed before forking, so that workers never inherit an open
+        # connection, and again in each worker in case one slipped through;
+        # every worker connects on its first query
+        close_connections()
+        return self.pool_class(self.workers, initializer=close_connections)
+
+    def get_task(self, func):
+        global _task
+        _task = func
+        return _run_task
+
+
+EXECUTORS = {
+    'serial': SerialExecutor,
+    'thread': ThreadExecutor,
+    'process': ProcessExecutor,
+}
+
+def get_executor(name, workers=None):
+    """Returns an executor instance given its name and worker count"""
+    try:
+        return EXECUTORS[name](workers)
+    except KeyError:
+        raise ValueError('Unknown executor "%s". Choose one of: %s' % (name, ', '.join(sorted(EXECUTORS))))
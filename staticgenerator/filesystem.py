@@ -1,13 +1,49 @@
 #!/usr/bin/env python
 #-*- coding:utf-8 -*-
 
+import hashlib
 import os
+import stat
 import tempfile
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+BLOCK_SIZE = 64 * 1024
+
+def get_state_dir(name, web_root):
+    """
+    Returns a directory on local disk, outside the document root, for the
+    name state (lock files, checkpoints) of the site published to web_root.
+    """
+    if isinstance(web_root, unicode):
+        web_root = web_root.encode('utf-8')
+    digest = hashlib.md5(os.path.abspath(web_root)).hexdigest()[:8]
+    return os.path.join(tempfile.gettempdir(), 'staticgenerator-%s-%s' % (name, digest))
+
 class FileSystem(object):
     def exists(self, path):
         return os.path.exists(path)
 
+    def getsize(self, path):
+        return os.path.getsize(path)
+
+    def digest(self, path):
+        """Returns the md5 hex digest of a file's content"""
+        md5 = hashlib.md5()
+        f = open(path, 'rb')
+        try:
+            for block in iter(lambda: f.read(BLOCK_SIZE), ''):
+                md5.update(block)
+        finally:
+            f.close()
+        return md5.hexdigest()
+
     def makedirs(self, path):
         os.makedirs(path)
 
@@ -15,7 +51,12 @@ class FileSystem(object):
         return tempfile.mkstemp(dir=directory)
 
     def write(self, f, content):
-        return os.write(f, content)
+        """Writes all of content to f, retrying after short writes"""
+        total = len(content)
+        while content:
+            # Copies the rest only after a short write, which is rare
+            content = content[os.write(f, content):]
+        return total
 
     def close(self, f):
         os.close(f)
@@ -31,6 +72,17 @@ class FileSystem(object):
 
     def rmdir(self, directory):
         os.rmdir(directory)
+
+    def scandir(self, directory):
+        """
+        Returns (name, is_directory) for each entry of directory, without
+        following symlinks. Uses scandir (or its backport) when available,
+        which needs no stat() call per entry.
+        """
+        if scandir is not None:
+            return [(entry.name, entry.is_dir(follow_symlinks=False)) for entry in scandir(directory)]
+        return [(name, stat.S_ISDIR(os.lstat(os.path.join(directory, name)).st_mode))
+                for name in os.listdir(directory)]
         
     def join(self, *paths):
         if not paths:
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Remembering when builds last succeeded, for incremental rebuilds."""
+import json
+import os
+import tempfile
+from datetime import datetime
+
+
+class BuildState(object):
+    """
+    A small JSON file holding, for each named build, the time (seconds
+    since the epoch) its last successful run started.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def load(self):
+        try:
+            f = open(self.filename)
+        except IOError:
+            return {}
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+
+    def get(self, name):
+        return self.load().get(name)
+
+    def set(self, name, timestamp):
+        state = self.load()
+        state[name] = timestamp
+
+        # Written to a temporary file and renamed, like published pages
+        fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)))
+        # A file object writes everything; os.write may stop short
+        f = os.fdopen(fd, 'w')
+        try:
+            f.write(json.dumps(state, indent=2, sort_keys=True))
+        finally:
+            f.close()
+        os.rename(tmpname, self.filename)
+
+
+def to_datetime(timestamp, use_tz=False):
+    """Converts a timestamp to a datetime comparable with model fields"""
+    if use_tz:
+        from django.utils.timezone import utc
+        return datetime.fromtimestamp(timestamp, utc)
+    return datetime.fromtimestamp(timestamp)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Coalescing the publishes and deletes fired by model signals.
+
+A bulk admin action or an import saves hundreds of objects, and calling
+quick_publish/quick_delete from post_save does the work once per save,
+often for the same paths. An Invalidator collects the paths instead and
+handles them in one batch: when the current transaction commits, or once
+a debounce window has passed outside of transactions.
+"""
+import atexit
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+
+logger = logging.getLogger('staticgenerator')
+
+# Invalidators with a debounce window, flushed when the process exits
+invalidators = weakref.WeakSet()
+
+def flush_all():
+    """Handles the paths every Invalidator is still collecting"""
+    for invalidator in list(invalidators):
+        invalidator.flush()
+
+atexit.register(flush_all)
+
+
+class Batch(object):
+    """Paths waiting to be published or deleted; the last action wins"""
+
+    def __init__(self):
+        self.actions = OrderedDict()
+
+    def add(self, action, paths):
+        for path in paths:
+            self.actions.pop(path, None)
+            self.actions[path] = action
+
+    def paths(self, action):
+        return [path for path, queued in self.actions.iteritems() if queued == action]
+
+    def __len__(self):
+        return len(self.actions)
+
+
+class Invalidator(object):
+    """
+    Publishes or deletes resources once the current transaction commits.
+
+    Inside a transaction, paths are collected until it commits and are
+    dropped if it rolls back. Outside of transactions they are handled
+    right away, or, when delay (STATIC_GENERATOR_COALESCE_DELAY) is set,
+    collected for that many seconds first.
+
+    Other keywords are passed to the StaticGenerator doing the work::
+
+        invalidator = Invalidator(delay=2)
+        invalidator.connect(Post, FlatPage)
+    """
+
+    def __init__(self, delay=None, using=None, transaction=None, generator=None, **kw):
+        self.generator = generator
+        if not generator:
+            from staticgenerator import StaticGenerator
+            self.generator = StaticGenerator
+
+        self.kw = kw
+        self.gen = self.generator(**kw)
+
+        self.delay = delay
+        if delay is None:
+            self.delay = getattr(self.gen.settings, 'STATIC_GENERATOR_COALESCE_DELAY', 0)
+        self.using = using
+
+        self.transaction = transaction
+        if not transaction:
+            from django.db import transaction
+            self.transaction = transaction
+
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.waiting = None
+        self.timer = None
+        if self.delay:
+            invalidators.add(self)
+
+    def publish(self, *resources):
+        self.add('publish', resources)
+
+    def delete(self, *resources):
+        self.add('delete', resources)
+
+    def add(self, action, resources):
+        paths = list(self.gen.extract_resources(resources))
+
+        batch = self.get_transaction_batch()
+        if batch is not None:
+            batch.add(action, paths)
+            return
+
+        if not self.delay:
+            batch = Batch()
+            batch.add(action, paths)
+            self.run(batch)
+            return
+
+        with self.lock:
+            if self.waiting is None:
+                self.waiting = Batch()
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+            self.waiting.add(action, paths)
+
+    def get_transaction_batch(self):
+        """
+        Returns the batch of the transaction this thread is in, or None
+        outside of transactions (and on Django versions without on_commit).
+        """
+        if not hasattr(self.transaction, 'on_commit'):
+            return None
+        connection = self.transaction.get_connection(self.using)
+        if not getattr(connection, 'in_atomic_block', False):
+            return None
+
+        # A batch whose callback is no longer registered belonged to a
+        # transaction (or savepoint) that has committed or rolled back
+        batch = getattr(self.local, 'batch', None)
+        if batch is None or not self.is_registered(connection, batch):
+            batch = self.local.batch = Batch()
+            batch.commit = lambda: self.run(batch)
+            self.transaction.on_commit(batch.commit, using=self.using)
+        return batch
+
+    def is_registered(self, connection, batch):
+        return any(entry[1] is batch.commit for entry in connection.run_on_commit)
+
+    def flush(self):
+        """Handles the paths waiting for the debounce window right away"""
+        with self.lock:
+            batch, self.waiting = self.waiting, None
+            timer, self.timer = self.timer, None
+        if timer:
+            timer.cancel()
+        if batch:
+            self.run(batch)
+
+    def run(self, batch):
+        for action in ('delete', 'publish'):
+            paths = batch.paths(action)
+            if paths:
+                self.execute(action, paths)
+
+    def execute(self, action, paths):
+        gen = self.generator(*paths, **dict(self.kw, fail_silently=True))
+        results = getattr(gen, action)()
+        for outcome in results.failed:
+            logger.error('Could not %s %s: %s', action, outcome.path, outcome.error)
+
+    def connect(self, *models):
+        """Deletes the pages of models' instances when they are saved or deleted"""
+        from django.db.models.signals import post_save, post_delete
+        for model in models:
+            post_save.connect(self.changed, sender=model, weak=False)
+            post_delete.connect(self.changed, sender=model, weak=False)
+
+    def changed(self, sender, instance, **kw):
+        resources = [instance]
+        if self.gen.track_dependencies:
+            resources.extend(self.gen.dependents(instance))
+        self.delete(*resources)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Per-path locks keeping concurrent workers from writing the same page.
+
+Paths are hashed into a fixed number of slots, and it is slots that are
+locked: threads of one process coordinate through a table of the slots they
+hold, processes on the same host through flock()ed lock files, one per slot,
+in a lock directory. Locks never wait: a worker that cannot get one leaves
+the page to whoever holds it, or to whoever holds another path of its slot.
+"""
+import errno
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Bounds the number of lock files; two of the paths being written at once
+# rarely share a slot
+SLOTS = 1024
+
+
+class PathLocks(object):
+    """
+    Non-blocking locks by URL path. Without a directory (or without fcntl)
+    they only exclude threads of the current process.
+
+    Lock files are left in place: removing one while another process has it
+    open would let two processes lock the same slot. There are never more
+    than slots of them.
+    """
+
+    def __init__(self, directory=None, slots=SLOTS):
+        self.directory = directory
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.held = {}
+
+    def get_slot(self, path):
+        if isinstance(path, unicode):
+            path = path.encode('utf-8')
+        return int(hashlib.md5(path).hexdigest(), 16) % self.slots
+
+    def get_filename(self, slot):
+        return os.path.join(self.directory, '%d.lock' % slot)
+
+    def open(self, slot):
+        filename = self.get_filename(slot)
+        try:
+            return os.open(filename, os.O_RDWR | os.O_CREAT, 0644)
+        except OSError, err:
+            if err.errno != errno.ENOENT:
+                raise
+        try:
+            os.makedirs(self.directory)
+        except OSError, err:
+            if err.errno != errno.EEXIST:
+                raise
+        return os.open(filename, os.O_RDWR | os.O_CREAT, 0644)
+
+    def acquire(self, path):
+        """
+        Returns True if path was locked, False if someone else holds it or
+        another path of its slot
+        """
+        slot = self.get_slot(path)
+        with self.lock:
+            if slot in self.held:
+                return False
+            self.held[slot] = (path, None)
+
+        if not self.directory or fcntl is None:
+            return True
+
+        fd = None
+        try:
+            fd = self.open(slot)
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError), err:
+            if fd is not None:
+                os.close(fd)
+            with self.lock:
+                del self.held[slot]
+            if err.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+
+        with self.lock:
+            self.held[slot] = (path, fd)
+        return True
+
+    def release(self, path):
+        slot = self.get_slot(path)
+        with self.lock:
+            if self.held.get(slot, (None, None))[0] != path:
+                return
+            fd = self.held.pop(slot)[1]
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
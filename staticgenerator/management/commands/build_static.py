@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Publishes many pages at once, resuming where an interrupted run stopped.
+
+    ./manage.py build_static / /about/ blog.Post blog.Post:published
+"""
+import os
+from optparse import make_option
+from timeit import default_timer
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import Results, StaticGenerator, StaticGeneratorException
+from ...checkpoint import Checkpoint
+from ...filesystem import get_state_dir
+
+OPTIONS = (
+    ('--checkpoint', dict(dest='checkpoint', default=None,
+                          help='File listing the completed paths. Defaults to a file under the temporary directory.')),
+    ('--restart', dict(dest='restart', action='store_true', default=False,
+                       help='Ignore the checkpoint and publish every page again.')),
+    ('--executor', dict(dest='executor', default=None,
+                        help='serial, thread or process. Defaults to STATIC_GENERATOR_EXECUTOR.')),
+    ('--workers', dict(dest='workers', default=None,
+                       help='Number of threads or processes.')),
+    ('--shard', dict(dest='shard', default=None,
+                     help='Only publish this slice of the pages, as index/count (such as 3/16).')),
+    ('--fail-fast', dict(dest='fail_fast', action='store_true', default=False,
+                         help='Stop at the first page that fails instead of reporting failures at the end.')),
+    ('--progress', dict(dest='progress', default='1000',
+                        help='Report progress every N pages (0 to turn off). Defaults to 1000.')),
+)
+
+
+def get_model(app_label, model_name):
+    try:
+        from django.apps import apps
+        return apps.get_model(app_label, model_name)
+    except ImportError:
+        from django.db.models import get_model
+        return get_model(app_label, model_name)
+
+def get_resource(spec):
+    """
+    Returns the resource a command line spec stands for: a URL ('/blog/'),
+    every instance of a model ('blog.Post'), or a manager or QuerySet
+    returned by a model attribute ('blog.Post:published').
+    """
+    if spec.startswith('/'):
+        return spec
+
+    name, _, attribute = spec.partition(':')
+    try:
+        app_label, model_name = name.split('.')
+        model = get_model(app_label, model_name)
+    except (ValueError, LookupError):
+        model = None
+    if model is None:
+        raise CommandError('"%s" is neither a URL (starting with /) nor app_label.Model[:queryset]' % spec)
+
+    if not attribute:
+        return model
+    try:
+        resource = getattr(model, attribute)
+    except AttributeError:
+        raise CommandError('%s has no attribute "%s"' % (name, attribute))
+    if callable(resource):
+        resource = resource()
+    return resource
+
+def get_checkpoint_filename(gen):
+    """
+    Returns the default checkpoint of a build publishing to gen.web_root: on
+    local disk, outside the document root, one per shard as shards may share
+    a web root.
+    """
+    name = 'checkpoint'
+    if gen.shard:
+        name += '-%dof%d' % gen.shard
+    return os.path.join(get_state_dir('build', gen.web_root), name)
+
+
+class Command(BaseCommand):
+    help = ('Publishes the given URLs, models and querysets, checkpointing each '
+            'completed page so that an interrupted build resumes where it stopped.')
+    args = '<url or app_label.Model[:queryset] ...>'
+
+    if hasattr(BaseCommand, 'option_list'):
+        option_list = BaseCommand.option_list + tuple(make_option(flag, **kw) for flag, kw in OPTIONS)
+
+    def add_arguments(self, parser):
+        parser.add_argument('resources', nargs='+', metavar='resource')
+        for flag, kw in OPTIONS:
+            parser.add_argument(flag, **kw)
+
+    def handle(self, *args, **options):
+        specs = args or options.get('resources')
+        if not specs:
+            raise CommandError('Give at least one URL or app_label.Model to publish.')
+        resources = [get_resource(spec) for spec in specs]
+
+        try:
+            gen = StaticGenerator(*resources,
+                                  lazy=True,
+                                  fail_silently=not options['fail_fast'],
+                                  shard=options['shard'],
+                                  executor=options['executor'],
+                                  workers=options['workers'] and int(options['workers']))
+        except StaticGeneratorException, err:
+            raise CommandError(str(err))
+
+        filename = options['checkpoint'] or get_checkpoint_filename(gen)
+        checkpoint = Checkpoint(filename)
+        if options['restart']:
+            checkpoint.remove()
+        elif len(checkpoint):
+            self.write('Resuming: %d pages were already published' % len(checkpoint))
+
+        self.progress = int(options['progress'])
+        self.started = default_timer()
+        try:
+            results = self.build(gen, checkpoint)
+        except KeyboardInterrupt:
+            raise CommandError('Interrupted; run the command again to resume from %s' % filename)
+        finally:
+            checkpoint.close()
+
+        self.report(results)
+        if results.failed:
+            raise CommandError('%d pages failed; run the command again to retry them' % len(results.failed))
+        checkpoint.remove()
+        if gen.incremental:
+            gen.build_state.set(gen.build_name, gen.started)
+        if gen.content_type_map:
+            gen.write_content_type_map()
+
+    def build(self, gen, checkpoint):
+        results = Results(keep=False)
+        outcomes = gen.executor.imap(gen.publish_from_path, checkpoint.filter(gen.resources))
+        try:
+            for outcome in outcomes:
+                gen.add_outcome(results, outcome)
+                if outcome.ok:
+                    checkpoint.add(outcome.path)
+                else:
+                    self.write('Failed %s: %s' % (outcome.path, outcome.error))
+                if self.progress and not results.total % self.progress:
+                    self.report(results)
+        finally:
+            outcomes.close()
+        return results
+
+    def report(self, results):
+        seconds = default_timer() - self.started
+        self.write('%d pages (%d written, %d unchanged, %d failed) in %.1fs, %.1f pages/s' % (
+            results.total, results.written, results.skipped, len(results.failed),
+            seconds, results.total / (seconds or 1)))
+
+    def write(self, message):
+        self.stdout.write(message + '\n')
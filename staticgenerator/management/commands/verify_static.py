@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Checks that a (sharded) build published every page, merging the web roots
+of shards built on separate hosts first if asked to.
+
+    ./manage.py verify_static / blog.Post --root /mnt/node1/www --root /mnt/node2/www --merge
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import StaticGenerator
+from ...shards import merge, verify
+from .build_static import get_resource
+
+OPTIONS = (
+    ('--root', dict(dest='roots', action='append', default=None,
+                    help='A web root shards were built into; repeat for each. Defaults to WEB_ROOT.')),
+    ('--merge', dict(dest='merge', action='store_true', default=False,
+                     help='Copy the files of every --root into WEB_ROOT before verifying it.')),
+)
+
+
+class Command(BaseCommand):
+    help = 'Lists the pages of the given URLs, models and querysets that were not published.'
+    args = '<url or app_label.Model[:queryset] ...>'
+
+    if hasattr(BaseCommand, 'option_list'):
+        option_list = BaseCommand.option_list + tuple(make_option(flag, **kw) for flag, kw in OPTIONS)
+
+    def add_arguments(self, parser):
+        parser.add_argument('resources', nargs='+', metavar='resource')
+        for flag, kw in OPTIONS:
+            parser.add_argument(flag, **kw)
+
+    def handle(self, *args, **options):
+        specs = args or options.get('resources')
+        if not specs:
+            raise CommandError('Give at least one URL or app_label.Model to verify.')
+        gen = StaticGenerator(*[get_resource(spec) for spec in specs], lazy=True)
+
+        roots = options['roots']
+        if options['merge']:
+            if not roots:
+                raise CommandError('--merge needs the --root of every shard.')
+            self.stdout.write('Copied %d files into %s\n' % (merge(roots, gen.web_root), gen.web_root))
+            roots = None
+
+        missing = verify(gen, roots)
+        for path in missing:
+            self.stdout.write('Missing %s\n' % path)
+        if missing:
+            raise CommandError('%d pages are missing' % len(missing))
+        self.stdout.write('Every page is published\n')
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+A persistent record of every file StaticGenerator has written.
+
+The manifest is a small SQLite database indexed by URL path and by source
+object, so questions like "what is published under /blog/?" or "which files
+came from this Post?" are answered without walking WEB_ROOT.
+
+It also holds the dependencies of each page (the model instances it was
+rendered from, see dependencies.py), indexed by source object, to answer
+"which pages show this Post?".
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# Sorts after any character a path can hold, see Manifest.by_prefix
+PREFIX_END = u'\U0010ffff'
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        filename TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        digest TEXT,
+        model TEXT,
+        pk TEXT,
+        published REAL NOT NULL,
+        expires REAL,
+        content_type TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS files_source ON files (model, pk)',
+    '''CREATE TABLE IF NOT EXISTS dependencies (
+        path TEXT NOT NULL,
+        model TEXT NOT NULL,
+        pk TEXT NOT NULL,
+        PRIMARY KEY (path, model, pk)
+    )''',
+    'CREATE INDEX IF NOT EXISTS dependencies_source ON dependencies (model, pk)',
+)
+
+# Columns added since the first release: (table, column, definition). They
+# are added to older databases when connecting.
+MIGRATIONS = (
+    ('files', 'expires', 'REAL'),
+    ('files', 'content_type', 'TEXT'),
+)
+
+# Statements run after the migrations, as they need the columns they add
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS files_expires ON files (expires)',
+    'CREATE INDEX IF NOT EXISTS files_filename ON files (filename)',
+)
+
+# The pk of a dependency on every row of a model, see dependencies.depends_on
+ANY = u'*'
+
+
+COLUMNS = 'path, filename, size, digest, model, pk, published, expires, content_type'
+
+Entry = namedtuple('Entry', COLUMNS)
+
+
+def to_unicode(s):
+    if isinstance(s, str):
+        return s.decode('utf-8')
+    return s
+
+def get_label(model):
+    """Returns 'app_label.modelname' for a model (or instance)"""
+    opts = model._meta
+    return '%s.%s' % (opts.app_label, opts.object_name.lower())
+
+def get_source(model, pk):
+    """Returns the (model label, pk) source of a model (or instance) and pk"""
+    return get_label(model), unicode(pk)
+
+
+class SourcedURL(unicode):
+    """A URL path that remembers the (model label, pk) it was built from"""
+
+    def __new__(cls, url, source=None):
+        self = unicode.__new__(cls, to_unicode(url))
+        self.source = source
+        return self
+
+
+class Manifest(object):
+    """
+    Records path, filename, size, digest, source model/pk and publish time
+    for every generated file.
+
+    Each thread (and each forked process) gets its own connection; the
+    database runs in WAL mode so parallel publishers don't block readers.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.local = threading.local()
+
+    def get_connection(self):
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.filename, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self.migrate(connection)
+            for statement in INDEXES:
+                connection.execute(statement)
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def migrate(self, connection):
+        for table, column, definition in MIGRATIONS:
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(%s)' % table)]
+            if column not in columns:
+                connection.execute('ALTER TABLE %s ADD COLUMN %s %s' % (table, column, definition))
+
+    def execute(self, sql, params=()):
+        return self.get_connection().execute(sql, params)
+
+    def query(self, sql, params=()):
+        return [Entry(*row) for row in self.execute('SELECT %s FROM files %s' % (COLUMNS, sql), params)]
+
+    def record(self, path, filename, size, digest=None, source=None, expires=None, content_type=None):
+        model, pk = source or (None, None)
+        self.execute('INSERT OR REPLACE INTO files (%s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)' % COLUMNS,
+                     (to_unicode(path), to_unicode(filename), size, digest, model, pk, time.time(), expires,
+                      content_type and to_unicode(content_type)))
+
+    def set_expires(self, path, expires):
+        self.execute('UPDATE files SET expires = ? WHERE path = ?', (expires, to_unicode(path)))
+
+    def expiring(self, before, limit=100):
+        """Returns the entries expiring before the given time, soonest first"""
+        return self.query('WHERE expires <= ? ORDER BY expires LIMIT ?', (before, limit))
+
+    def claim(self, entry, until):
+        """
+        Postpones entry's expiry to until, unless another process changed it
+        since entry was read. Returns True if this call changed it, so that
+        several refreshers never refresh the same page at once.
+        """
+        cursor = self.execute('UPDATE files SET expires = ? WHERE path = ? AND expires = ?',
+                              (until, entry.path, entry.expires))
+        return cursor.rowcount == 1
+
+    def release(self, entry, until, expires):
+        """
+        Gives back a claim(entry, until), setting the page's expiry to
+        expires so that it is picked up again then, unless it has been
+        republished since.
+        """
+        self.execute('UPDATE files SET expires = ? WHERE path = ? AND expires = ?',
+                     (expires, entry.path, until))
+
+    def remove(self, path):
+        path = to_unicode(path)
+        self.execute('DELETE FROM files WHERE path = ?', (path,))
+        self.execute('DELETE FROM dependencies WHERE path = ?', (path,))
+
+    def remove_many(self, paths):
+        """Removes the entries of every path, in one transaction"""
+        rows = [(to_unicode(path),) for path in paths]
+        connection = self.get_connection()
+        connection.execute('BEGIN')
+        try:
+            connection.executemany('DELETE FROM files WHERE path = ?', rows)
+            connection.executemany('DELETE FROM dependencies WHERE path = ?', rows)
+        except:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def set_dependencies(self, path, sources):
+        """Replaces the (model label, pk) sources path was rendered from"""
+        path = to_unicode(path)
+        rows = [(path, model, unicode(pk)) for model, pk in sources]
+        connection = self.get_connection()
+        connection.execute('BEGIN')
+        try:
+            connection.execute('DELETE FROM dependencies WHERE path = ?', (path,))
+            connection.executemany('INSERT OR IGNORE INTO dependencies (path, model, pk) VALUES (?, ?, ?)', rows)
+        except:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def dependencies(self, path):
+        """Returns the sorted (model label, pk) sources path was rendered from"""
+        return [tuple(row) for row in self.execute('SELECT model, pk FROM dependencies WHERE path = ? ORDER BY model, pk',
+                                                   (to_unicode(path),))]
+
+    def dependents(self, model, pk):
+        """Returns the paths rendered from the given model label and pk, in order"""
+        rows = self.execute('SELECT DISTINCT path FROM dependencies WHERE model = ? AND pk IN (?, ?) ORDER BY path',
+                            (model, unicode(pk), ANY))
+        return [row[0] for row in rows]
+
+    def get(self, path):
+        entries = self.query('WHERE path = ?', (to_unicode(path),))
+        return entries and entries[0] or None
+
+    def by_filename(self, filename):
+        """Returns the entry of the page published to filename, or None"""
+        entries = self.query('WHERE filename = ?', (to_unicode(filename),))
+        return entries and entries[0] or None
+
+    def by_prefix(self, prefix):
+        """Returns the entries whose path starts with prefix, in path order"""
+        # A range on the primary key rather than LIKE, so the index is used
+        prefix = to_unicode(prefix)
+        return self.query('WHERE path >= ? AND path < ? ORDER BY path', (prefix, prefix + PREFIX_END))
+
+    def by_source(self, model, pk):
+        """Returns the entries published from the given model label and pk"""
+        return self.query('WHERE model = ? AND pk = ? ORDER BY path', (model, unicode(pk)))
+
+    def all(self):
+        return self.query('ORDER BY path')
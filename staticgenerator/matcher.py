@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Matching request paths against STATIC_GENERATOR_URLS."""
+import re
+
+# Python's re module refuses patterns with more groups than this
+MAX_GROUPS = 99
+
+# Patterns that can't share an alternation with others: backreferences and
+# conditionals would point at the wrong group, and inline flags would apply
+# to every pattern.
+STANDALONE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[iLmsux]+\)')
+
+
+class LRUCache(object):
+    """
+    A bounded, approximately least-recently-used mapping.
+
+    Entries live in two generations of size / 2. A hit in the old
+    generation promotes the entry; when the new generation fills up, the
+    old one is dropped as a whole. Every operation is a plain dict
+    operation, so no lock is needed.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.half = max(size // 2, 1)
+        self.new = {}
+        self.old = {}
+
+    def get(self, key, default=None):
+        try:
+            return self.new[key]
+        except KeyError:
+            pass
+        try:
+            value = self.old[key]
+        except KeyError:
+            return default
+        self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        if not self.size:
+            return
+        if len(self.new) >= self.half:
+            self.old = self.new
+            self.new = {}
+        self.new[key] = value
+
+    def __len__(self):
+        return len(set(self.new) | set(self.old))
+
+
+def strip_anchor(pattern):
+    # Patterns are only ever used with re.match, so a leading ^ is redundant;
+    # hoisting it out of the alternation lets every branch share it.
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    return '(?:%s)' % pattern
+
+def combine(patterns):
+    """Compiles patterns into as few alternations as the re module allows"""
+    regexes = []
+    chunk, groups = [], 0
+
+    def flush():
+        if not chunk:
+            return
+        try:
+            regexes.append(re.compile('^(?:%s)' % '|'.join([strip_anchor(pattern) for pattern in chunk])))
+        except re.error:
+            # e.g. the same group name used by two patterns
+            regexes.extend([re.compile(pattern) for pattern in chunk])
+
+    for pattern in patterns:
+        compiled = re.compile(pattern)
+        if STANDALONE.search(pattern):
+            regexes.append(compiled)
+            continue
+        if groups + compiled.groups > MAX_GROUPS:
+            flush()
+            chunk, groups = [], 0
+        chunk.append(pattern)
+        groups += compiled.groups
+    flush()
+
+    return tuple(regexes)
+
+
+class URLMatcher(object):
+    """
+    Tells whether a path matches any of a list of regular expressions.
+
+    The patterns are compiled into a single alternation (split only where
+    the re module requires it), so matching stays one C-level scan however
+    many patterns there are. Recent decisions are kept in an LRU cache.
+    """
+
+    def __init__(self, patterns, cache_size=1024):
+        self.patterns = tuple(patterns)
+        self.regexes = combine(self.patterns)
+        self.cache = LRUCache(cache_size)
+
+    def match(self, path):
+        matched = self.cache.get(path)
+        if matched is None:
+            matched = False
+            for regex in self.regexes:
+                if regex.match(path):
+                    matched = True
+                    break
+            self.cache.set(path, matched)
+        return matched
@@ -1,6 +1,11 @@
-import re
-from django.conf import settings
-from staticgenerator import StaticGenerator
+import threading
+
+from django.conf import settings as django_settings
+from . import StaticGenerator
+import dependencies
+from matcher import URLMatcher
+from refresher import create_refresher
+from writebehind import QueueFull, create_queue
 
 class StaticGeneratorMiddleware(object):
     """
@@ -12,15 +17,88 @@ class StaticGeneratorMiddleware(object):
             r'^/$',
             r'^/blog',
         )
+
+    The patterns are compiled into a single matcher, and the decision for
+    the last settings.STATIC_GENERATOR_URL_CACHE_SIZE paths is cached.
+
+    With settings.STATIC_GENERATOR_ASYNC, pages are written by background
+    threads after the response is returned (see writebehind.WriteBehindQueue).
+
+    With settings.STATIC_GENERATOR_TRACK_DEPENDENCIES, the model instances
+    loaded while handling a request are recorded as dependencies of the
+    published page.
+
+    With settings.STATIC_GENERATOR_SINGLE_FLIGHT, concurrent requests for a
+    page that is not published yet write it once: the first to get its lock
+    writes it, the others skip (see StaticGenerator.publish_once).
+
+    Pages matching settings.STATIC_GENERATOR_TTLS are republished by a
+    background thread before they expire (see refresher.Refresher).
+
+    Requests with a query string are only published when every parameter is
+    in settings.STATIC_GENERATOR_VARIANT_PARAMS, each combination of values
+    (and of settings.STATIC_GENERATOR_VARIANT_HEADERS) to its own file (see
+    variants.Variants).
+
+    The generator, queue and refresher are built from the Django settings
+    when the middleware is first instantiated, and shared by every instance
+    (each handler, render engines included, instantiates its middleware).
+    An instance given its own settings gets its own.
         
     """
-    urls = tuple([re.compile(url) for url in settings.STATIC_GENERATOR_URLS])
-    gen = StaticGenerator()
+    lock = threading.Lock()
+    urls = gen = queue = refresher = None
+
+    def __init__(self, settings=None):
+        if settings is not None:
+            self.setup(self, settings)
+        elif StaticGeneratorMiddleware.gen is None:
+            with self.lock:
+                if StaticGeneratorMiddleware.gen is None:
+                    self.setup(StaticGeneratorMiddleware, django_settings)
+
+    @staticmethod
+    def setup(target, settings):
+        target.urls = URLMatcher(settings.STATIC_GENERATOR_URLS,
+                                 getattr(settings, 'STATIC_GENERATOR_URL_CACHE_SIZE', 1024))
+        gen = StaticGenerator(settings=settings)
+        target.queue = create_queue(gen.single_flight and gen.publish_once or gen.publish_from_path, settings)
+        target.refresher = create_refresher(gen, settings)
+        # Set last, as it tells that the rest is ready
+        target.gen = gen
     
+    def process_request(self, request):
+        if self.gen.track_dependencies:
+            dependencies.start()
+
     def process_response(self, request, response):
-        if response.status_code == 200:
-            for url in self.urls:
-                if url.match(request.path_info):
-                    self.gen.publish_from_path(request.path_info, response.content)
-                    break
+        if self.refresher:
+            self.refresher.start()
+        sources = None
+        if self.gen.track_dependencies:
+            sources = dependencies.stop()
+        # Streaming responses are sent as they are produced, leaving nothing
+        # to publish; quick_publish and build_static write them instead
+        if response.status_code == 200 and not getattr(response, 'streaming', False) \
+                and self.urls.match(request.path_info):
+            path = self.gen.get_variant_path(request.path_info, request.META.get('QUERY_STRING', ''), request.META)
+            if path is None:
+                return response
+            if sources is not None:
+                self.gen.manifest.set_dependencies(path, sources)
+            self.publish(path, response.content, response.get('Content-Type', None))
         return response
+
+    def publish(self, path, content, content_type=None):
+        if not self.queue:
+            self.publish_page(path, content, content_type)
+            return
+        try:
+            self.queue.put(path, content, content_type)
+        except QueueFull:
+            pass
+
+    def publish_page(self, path, content, content_type=None):
+        if self.gen.single_flight:
+            return self.gen.publish_once(path, content, content_type)
+        return self.gen.publish_from_path(path, content, content_type)
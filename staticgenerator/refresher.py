@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Republishing pages before their TTL runs out.
+
+Pages published with a TTL (STATIC_GENERATOR_TTLS) have an expiry time in
+the manifest. A Refresher re-renders the pages about to expire and replaces
+them atomically, so the web server keeps serving the old copy until the new
+one is in place and no request waits on a cold render.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('staticgenerator')
+
+# Statuses telling that a page is gone for good, rather than failing for now
+GONE = (404, 410)
+
+
+class Refresher(object):
+    """
+    Every interval seconds, republishes the pages expiring within the next
+    interval, batch_size at a time. Pages that are gone (a 404 or a 410) are
+    deleted rather than left stale; on any other error the published page is
+    kept and its claim released, so that it is retried an interval later,
+    behind the pages that are due by then.
+
+    Pages are claimed in the manifest before being refreshed, so refreshers
+    running in several processes share the work. A page whose refresher dies
+    is retried once the claim runs out, after retry seconds.
+    """
+
+    def __init__(self, generator, interval=10, batch_size=100, retry=None):
+        self.generator = generator
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retry = retry or interval * 6
+
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.pid = None
+
+    def refresh(self):
+        """
+        Refreshes one batch of expiring pages; returns how many of them it
+        republished or deleted
+        """
+        manifest = self.generator.manifest
+        now = time.time()
+        entries = manifest.expiring(now + self.interval, self.batch_size)
+        done = 0
+        for entry in entries:
+            until = now + self.retry
+            if not manifest.claim(entry, until):
+                continue
+            try:
+                self.generator.publish_from_path(entry.path)
+                done += 1
+            except Exception, err:
+                if getattr(err, 'status_code', None) in GONE:
+                    logger.info('%s is gone, deleting it', entry.path)
+                    try:
+                        self.generator.delete_from_path(entry.path)
+                        done += 1
+                    except Exception:
+                        logger.exception('Could not delete %s', entry.path)
+                else:
+                    logger.exception('Could not refresh %s, keeping it', entry.path)
+                    try:
+                        manifest.release(entry, until, now + self.interval)
+                    except Exception:
+                        logger.exception('Could not release %s', entry.path)
+        return done
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                # Another batch right away only while every page of the last
+                # one was refreshed; failing pages wait for the next interval
+                while self.refresh() == self.batch_size and not self.stopped.is_set():
+                    pass
+            except Exception:
+                logger.exception('Could not refresh pages')
+
+    def start(self):
+        """Starts refreshing in a background thread, once per process"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # Threads don't survive a fork; each worker process gets its own
+            self.pid = os.getpid()
+            thread = threading.Thread(target=self.run, name='staticgenerator-refresher')
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def create_refresher(generator, settings):
+    """
+    Returns a Refresher configured from settings for generator, or None when
+    no page has a TTL or STATIC_GENERATOR_REFRESH is False.
+    """
+    if not generator.ttls or not getattr(settings, 'STATIC_GENERATOR_REFRESH', True):
+        return None
+    return Refresher(generator,
+                     interval=getattr(settings, 'STATIC_GENERATOR_REFRESH_INTERVAL', 10),
+                     batch_size=getattr(settings, 'STATIC_GENERATOR_REFRESH_BATCH_SIZE', 100))
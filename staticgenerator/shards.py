@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Splitting a build between processes or hosts.
+
+A generator created with shard='3/16' only publishes the paths whose
+stable hash falls in the third of sixteen shards. Running the sixteen
+shards anywhere, in any order, publishes every path exactly once; verify()
+then checks that nothing is missing, and merge() gathers the web roots of
+shards built on separate hosts.
+"""
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+def parse_shard(spec):
+    """
+    Returns (index, count) for a shard spec: 'index/count', with index
+    counted from 1, or such a tuple. Raises ValueError for invalid specs.
+    """
+    if isinstance(spec, basestring):
+        try:
+            index, count = [int(part) for part in spec.split('/')]
+        except ValueError:
+            raise ValueError('Invalid shard "%s", expected index/count such as 3/16' % spec)
+    else:
+        index, count = spec
+    if not 1 <= index <= count:
+        raise ValueError('Invalid shard %d/%d, the index goes from 1 to %d' % (index, count, count))
+    return index, count
+
+def shard_of(path, count):
+    """Returns the shard (from 1 to count) path belongs to"""
+    if isinstance(path, unicode):
+        path = path.encode('utf-8')
+    return int(hashlib.md5(path).hexdigest()[:8], 16) % count + 1
+
+def verify(generator, roots=None):
+    """
+    Returns the paths of generator (created without a shard) that have no
+    file in any of roots, WEB_ROOT by default.
+    """
+    roots = roots or [generator.web_root]
+    missing = []
+    for path in generator.resources:
+        relatives = [os.path.relpath(filename, generator.web_root)
+                     for filename in generator.get_filenames_from_path(path)]
+        if not any(generator.fs.exists(os.path.join(root, relative))
+                   for root in roots for relative in relatives):
+            missing.append(path)
+    return missing
+
+def merge(roots, target):
+    """
+    Copies every file from the web roots of separately built shards into
+    target, each written atomically. Returns the number of files copied.
+    """
+    copied = 0
+    for root in roots:
+        for directory, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.staticgenerator')]
+            destination = os.path.join(target, os.path.relpath(directory, root))
+            try:
+                os.makedirs(destination)
+            except OSError, err:
+                if err.errno != errno.EEXIST:
+                    raise
+            for name in filenames:
+                if name.startswith('.staticgenerator'):
+                    continue
+                f, tmpname = tempfile.mkstemp(dir=destination)
+                os.close(f)
+                shutil.copy2(os.path.join(directory, name), tmpname)
+                os.rename(tmpname, os.path.join(destination, name))
+                copied += 1
+    return copied
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Per-phase timings for StaticGenerator runs."""
+import heapq
+import threading
+from timeit import default_timer
+
+
+class Timer(object):
+    """Times a with block, then records it with its phase, path and size"""
+
+    def __init__(self, stats, phase, path):
+        self.stats = stats
+        self.phase = phase
+        self.path = path
+        self.size = None
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.phase, self.path, default_timer() - self.start, self.size)
+        return False
+
+class NullTimer(object):
+    """What StaticGenerator times phases with when it keeps no stats"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+
+class Stats(object):
+    """
+    Collects how long each phase ('extract', 'render', 'write', 'delete')
+    took, how many bytes it handled and which paths failed.
+
+    Anything with the same record() and fail() methods can be given to
+    StaticGenerator instead, to feed another metrics system. Stats are
+    kept by the process that does the work, so use the serial or thread
+    executors to collect them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # phase -> [count, seconds, bytes]
+        self.phases = {}
+        # path -> {phase: seconds}
+        self.paths = {}
+        # path -> bytes written
+        self.sizes = {}
+        # path -> error
+        self.failures = {}
+
+    def timer(self, phase, path):
+        return Timer(self, phase, path)
+
+    def record(self, phase, path, seconds, size=None):
+        with self.lock:
+            totals = self.phases.setdefault(phase, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += size or 0
+            if path is not None:
+                phases = self.paths.setdefault(path, {})
+                phases[phase] = phases.get(phase, 0.0) + seconds
+                if size is not None:
+                    self.sizes[path] = size
+
+    def fail(self, path, error):
+        with self.lock:
+            self.failures[path] = error
+
+    def slowest(self, n=10):
+        """Returns the n slowest paths as (seconds, path, {phase: seconds})"""
+        with self.lock:
+            return heapq.nlargest(n, [(sum(phases.values()), path, phases) for path, phases in self.paths.iteritems()])
+
+    def report(self, n=10):
+        lines = ['%-10s %8s %10s %10s %12s' % ('phase', 'count', 'seconds', 'avg ms', 'bytes')]
+        for phase, (count, seconds, size) in sorted(self.phases.items()):
+            lines.append('%-10s %8d %10.3f %10.3f %12d' % (phase, count, seconds, seconds / count * 1000, size))
+
+        if self.failures:
+            lines.append('')
+            lines.append('%d failed paths:' % len(self.failures))
+            for path, error in sorted(self.failures.items()):
+                lines.append('  %s: %s' % (path, error))
+
+        slowest = self.slowest(n)
+        if slowest:
+            lines.append('')
+            lines.append('%d slowest paths:' % len(slowest))
+            for seconds, path, phases in slowest:
+                detail = ', '.join(['%s %.3fs' % item for item in sorted(phases.items())])
+                lines.append('  %8.3fs  %s  (%s)' % (seconds, path, detail))
+
+        return '\n'.join(lines)
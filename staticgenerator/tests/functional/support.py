@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Fakes and helpers shared by the functional tests"""
+import os
+import shutil
+from os.path import abspath, exists, join
+
+from staticgenerator.staticgenerator import StaticGenerator
+
+def get_root_dir(name):
+    return join(abspath(os.curdir), "test_data", name)
+
+def reset(directory):
+    """Empties directory, creating it if needed"""
+    if exists(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+class CustomSettings(object):
+    def __init__(self, **kw):
+        for k,v in kw.iteritems():
+            setattr(self, k, v)
+
+class Response(dict):
+    status_code = 200
+
+    def __init__(self, content, content_type="text/html; charset=utf-8"):
+        dict.__init__(self, {'Content-Type': content_type})
+        self.content = content
+
+class StreamingResponse(dict):
+    """Stands in for django.http.StreamingHttpResponse"""
+    status_code = 200
+    streaming = True
+
+    def __init__(self, chunks, content_type="application/xml"):
+        dict.__init__(self, {'Content-Type': content_type})
+        self.streaming_content = chunks
+        self.closed = False
+
+    @property
+    def content(self):
+        raise AttributeError("This StreamingResponse instance has no `content` attribute.")
+
+    def close(self):
+        self.closed = True
+
+class RenderEngine(object):
+    """
+    Renders the response responses holds for a path, or, when responses is
+    a function, the one it returns for (path, query_string, meta).
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def render(self, path, query_string=None, meta=None):
+        if callable(self.responses):
+            return self.responses(path, query_string, meta)
+        return self.responses[path]
+
+def get_generator(web_root, *resources, **kw):
+    """
+    Returns a StaticGenerator of resources publishing to web_root, served as
+    example.com unless other settings are given.
+    """
+    kw.setdefault('settings', CustomSettings(WEB_ROOT=web_root, SERVER_NAME="example.com"))
+    return StaticGenerator(*resources,
+                           http_request=object,
+                           model_base=object,
+                           manager=object,
+                           model=object,
+                           queryset=object,
+                           **kw)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from os.path import exists, join
+from StringIO import StringIO
+
+from django.core.management.base import CommandError
+
+from staticgenerator.staticgenerator.checkpoint import Checkpoint
+from staticgenerator.staticgenerator.management.commands import build_static
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import RenderEngine, Response
+
+ROOT_DIR = support.get_root_dir("build_static")
+
+class Post(object):
+    @classmethod
+    def published(cls):
+        return ['/blog/1/']
+
+def render(path, query_string, meta):
+    rendered.append(path)
+    if path in failing:
+        raise ValueError("database went away")
+    return Response("content of %s" % path)
+
+rendered = []
+failing = set()
+
+def build(*specs, **options):
+    """Runs build_static over specs, rendering pages with render"""
+    del rendered[:]
+    options = dict(dict(checkpoint=join(ROOT_DIR, "checkpoint"), restart=False, executor=None,
+                        workers=None, shard=None, fail_fast=False, progress='0'), **options)
+    static_generator = build_static.StaticGenerator
+    build_static.StaticGenerator = lambda *resources, **kw: support.get_generator(
+        join(ROOT_DIR, "www"), *resources, render_engine=RenderEngine(render), **kw)
+    try:
+        command = build_static.Command(stdout=StringIO())
+        command.handle(*specs, **options)
+    finally:
+        build_static.StaticGenerator = static_generator
+    return command.stdout.getvalue()
+
+def test_resource_specs_are_urls_models_or_model_attributes():
+    get_model = build_static.get_model
+    build_static.get_model = lambda app_label, model_name: model_name == 'Post' and Post or None
+    try:
+        assert build_static.get_resource('/about/') == '/about/'
+        assert build_static.get_resource('blog.Post') is Post
+        assert build_static.get_resource('blog.Post:published') == ['/blog/1/']
+
+        for spec, message in (('about', 'neither a URL'), ('blog.Page', 'neither a URL'),
+                              ('blog.Post:drafts', 'has no attribute "drafts"')):
+            try:
+                build_static.get_resource(spec)
+            except CommandError, e:
+                assert message in str(e)
+            else:
+                assert False, "Shouldn't have gotten this far."
+    finally:
+        build_static.get_model = get_model
+
+def test_failed_build_resumes_where_it_stopped():
+    support.reset(ROOT_DIR)
+    failing.add('/b/')
+    try:
+        build('/a/', '/b/')
+    except CommandError, e:
+        assert '1 pages failed' in str(e)
+    else:
+        assert False, "Shouldn't have gotten this far."
+    finally:
+        failing.clear()
+    assert rendered == ['/a/', '/b/']
+
+    output = build('/a/', '/b/')
+
+    assert 'Resuming: 1 pages were already published' in output
+    assert rendered == ['/b/']
+    assert not exists(join(ROOT_DIR, "checkpoint"))
+
+def test_restart_ignores_the_checkpoint():
+    support.reset(ROOT_DIR)
+    checkpoint = Checkpoint(join(ROOT_DIR, "checkpoint"))
+    checkpoint.add('/a/')
+    checkpoint.close()
+
+    build('/a/', '/b/', restart=True)
+
+    assert rendered == ['/a/', '/b/']
+
+def test_default_checkpoint_is_kept_out_of_the_web_root_by_shard():
+    web_root = join(ROOT_DIR, "www")
+    gen = support.get_generator(web_root, shard='2/4')
+    other = support.get_generator(web_root, shard='3/4')
+
+    filename = build_static.get_checkpoint_filename(gen)
+
+    assert filename.endswith('checkpoint-2of4')
+    assert not filename.startswith(web_root)
+    assert filename != build_static.get_checkpoint_filename(other)
+    assert filename != build_static.get_checkpoint_filename(support.get_generator(web_root))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+from os.path import abspath, join
+
+from staticgenerator.staticgenerator.checkpoint import Checkpoint
+
+ROOT_DIR = join(abspath(os.curdir), "test_data")
+
+def get_checkpoint():
+    filename = join(ROOT_DIR, "checkpoint")
+    if os.path.exists(filename):
+        os.remove(filename)
+    return Checkpoint(filename)
+
+def test_checkpoint_remembers_done_paths():
+    checkpoint = get_checkpoint()
+    checkpoint.add("/a/")
+    checkpoint.add(u"/caf\xe9/")
+    checkpoint.close()
+
+    checkpoint = Checkpoint(checkpoint.filename)
+
+    assert "/a/" in checkpoint
+    assert u"/caf\xe9/" in checkpoint
+    assert list(checkpoint.filter(["/a/", "/b/", u"/caf\xe9/"])) == ["/b/"]
+    checkpoint.remove()
+
+def test_checkpoint_ignores_half_written_line():
+    checkpoint = get_checkpoint()
+    f = open(checkpoint.filename, "w")
+    f.write("/a/\n/b")
+    f.close()
+
+    checkpoint = Checkpoint(checkpoint.filename)
+
+    assert len(checkpoint) == 1
+    assert "/b" not in checkpoint
+
+    checkpoint.add("/c/")
+    checkpoint.close()
+    assert Checkpoint(checkpoint.filename).done == set([u"/a/", u"/c/"])
+
+    checkpoint.remove()
+    assert not os.path.exists(checkpoint.filename)
+
+def test_checkpoint_creates_its_directory():
+    filename = join(ROOT_DIR, "checkpoints", "build")
+    if os.path.exists(filename):
+        os.remove(filename)
+    checkpoint = Checkpoint(filename)
+
+    checkpoint.add("/a/")
+
+    assert "/a/" in Checkpoint(filename)
+    checkpoint.remove()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+from os.path import exists, join
+
+from staticgenerator.staticgenerator.filesystem import FileSystem, get_state_dir
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import RenderEngine, Response
+
+ROOT_DIR = support.get_root_dir("content_types")
+
+PAGES = {
+    "/": Response("<html></html>", "text/html; charset=utf-8"),
+    "/api/posts/": Response('{"posts": []}', "application/json"),
+    "/feed/": Response("<rss></rss>", "application/rss+xml; charset=utf-8"),
+    "/robots.txt": Response("User-agent: *", "text/plain"),
+    "/data/": Response("a,b", "text/csv"),
+}
+
+def get_generator(**kw):
+    support.reset(ROOT_DIR)
+    return support.get_generator(ROOT_DIR, *sorted(PAGES),
+                                 render_engine=RenderEngine(PAGES),
+                                 manifest=join(ROOT_DIR, ".staticgenerator-manifest"),
+                                 **kw)
+
+def test_index_file_follows_the_content_type():
+    gen = get_generator(content_types={"text/csv": "index.csv"})
+
+    gen.publish()
+
+    assert open(join(ROOT_DIR, "index.html")).read() == "<html></html>"
+    assert open(join(ROOT_DIR, "api", "posts", "index.json")).read() == '{"posts": []}'
+    assert open(join(ROOT_DIR, "feed", "index.rss")).read() == "<rss></rss>"
+    assert open(join(ROOT_DIR, "data", "index.csv")).read() == "a,b"
+    assert open(join(ROOT_DIR, "robots.txt")).read() == "User-agent: *"
+    assert not exists(join(ROOT_DIR, "api", "posts", "index.html"))
+    assert gen.manifest.get(u"/api/posts/").content_type == u"application/json"
+
+def test_delete_and_purge_find_non_html_index_files():
+    gen = get_generator()
+    gen.publish()
+
+    gen.delete_from_path("/api/posts/")
+    assert not exists(join(ROOT_DIR, "api", "posts"))
+
+    purged = gen.purge("/feed/")
+    assert purged.paths == 1
+    assert gen.manifest.get(u"/feed/") is None
+    assert not exists(join(ROOT_DIR, "feed"))
+
+def test_publish_once_skips_pages_published_with_another_index_file():
+    gen = get_generator(single_flight=True)
+    gen.publish()
+
+    assert gen.publish_once("/api/posts/") is False
+    assert not exists(join(ROOT_DIR, ".staticgenerator-locks"))
+    assert gen.locks.directory == get_state_dir("locks", ROOT_DIR)
+
+def test_content_type_map_lists_pages_that_are_not_html():
+    map_file = join(ROOT_DIR, "nginx", "types.map")
+    gen = get_generator(content_type_map=map_file)
+
+    gen.publish()
+
+    assert open(map_file).read().splitlines() == [
+        '"/api/posts/" "application/json";',
+        '"/data/" "text/csv";',
+        '"/feed/" "application/rss+xml; charset=utf-8";',
+        '"/robots.txt" "text/plain";',
+    ]
+
+def test_index_file_of_the_previous_content_type_is_removed():
+    # Found through the manifest, and by listing the directory without one
+    for with_manifest in (True, False):
+        gen = get_generator(compress=("gzip",), compress_min_size=0)
+        if not with_manifest:
+            gen.manifest = None
+        gen.publish_from_path("/api/posts/", "<html></html>", "text/html")
+        assert exists(join(ROOT_DIR, "api", "posts", "index.html.gz"))
+
+        gen.publish_from_path("/api/posts/", '{"posts": []}', "application/json")
+
+        assert sorted(os.listdir(join(ROOT_DIR, "api", "posts"))) == ["index.json", "index.json.gz"]
+
+def test_delete_and_purge_remove_sidecars_of_compressors_turned_off():
+    gen = get_generator(compress=("gzip",), compress_min_size=0)
+    gen.publish()
+    gen.compressors = []
+
+    gen.delete_from_path("/api/posts/")
+    gen.purge("/feed/")
+
+    assert not exists(join(ROOT_DIR, "api", "posts"))
+    assert not exists(join(ROOT_DIR, "feed"))
+
+def test_page_with_an_empty_body_is_written_empty():
+    support.reset(ROOT_DIR)
+    engine = RenderEngine({"/robots.txt": Response("", "text/plain")})
+    gen = support.get_generator(ROOT_DIR, "/robots.txt", render_engine=engine)
+    rendered = []
+    render = engine.render
+    engine.render = lambda path, *args: (rendered.append(path), render(path, *args))[1]
+
+    gen.publish()
+
+    assert rendered == ["/robots.txt"]
+    assert open(join(ROOT_DIR, "robots.txt")).read() == ""
+
+class CountingFileSystem(FileSystem):
+    def __init__(self):
+        self.calls = []
+
+    def exists(self, path):
+        self.calls.append(path)
+        return FileSystem.exists(self, path)
+
+def test_republishing_does_not_look_for_other_index_files():
+    for manifest in (None, join(ROOT_DIR, ".staticgenerator-manifest")):
+        support.reset(ROOT_DIR)
+        fs = CountingFileSystem()
+        gen = support.get_generator(ROOT_DIR, fs=fs, manifest=manifest)
+        gen.publish_from_path("/blog/a/", "<html></html>", "text/html")
+        gen.publish_from_path("/blog/b/", "{}", "application/json")
+
+        del fs.calls[:]
+        gen.publish_from_path("/blog/a/", "<html>again</html>", "text/html")
+
+        assert fs.calls == []
+        assert os.listdir(join(ROOT_DIR, "blog", "b")) == ["index.json"]
@@ -51,6 +51,22 @@ def test_can_write_content_in_tempfile():
 
     assert bytes == 3
 
+def test_write_retries_short_writes():
+    fs = FileSystem()
+    temp_file = tempfile.mkstemp()
+    write = os.write
+    os.write = lambda f, content: write(f, content[:2])
+
+    try:
+        bytes = fs.write(temp_file[0], "foobar")
+    finally:
+        os.write = write
+        os.close(temp_file[0])
+
+    assert bytes == 6
+    assert open(temp_file[1]).read() == "foobar"
+    os.remove(temp_file[1])
+
 def test_can_close_tempfile():
     fs = FileSystem()
 
@@ -79,6 +95,19 @@ def test_can_rename_file():
 
     f.close()
 
+def test_can_get_size_and_digest_of_file():
+    fs = FileSystem()
+
+    file_path = join(ROOT_DIR, "some_file")
+    f = open(file_path, "w")
+    f.write("content")
+    f.close()
+
+    assert fs.getsize(file_path) == 7
+    assert fs.digest(file_path) == "9a0364b9e99bb480dd25e1f0284c8555"
+
+    os.remove(file_path)
+
 def test_can_remove_file():
     fs = FileSystem()
 
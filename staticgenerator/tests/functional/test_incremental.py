@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+from os.path import abspath, join
+
+from staticgenerator.staticgenerator.incremental import BuildState
+
+ROOT_DIR = join(abspath(os.curdir), "test_data")
+
+def test_build_state_remembers_each_build():
+    filename = join(ROOT_DIR, "builds.json")
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    state = BuildState(filename)
+    assert state.get("default") is None
+
+    state.set("default", 10.5)
+    state.set("feeds", 20)
+
+    state = BuildState(filename)
+    assert state.get("default") == 10.5
+    assert state.get("feeds") == 20
+
+    os.remove(filename)
+
+def test_build_state_is_written_whole_despite_short_writes():
+    filename = join(ROOT_DIR, "builds.json")
+    names = ["build-%d" % i for i in range(100)]
+
+    write = os.write
+    os.write = lambda fd, data: write(fd, data[:max(1, len(data) // 2)])
+    try:
+        state = BuildState(filename)
+        for name in names:
+            state.set(name, 1)
+    finally:
+        os.write = write
+
+    assert sorted(BuildState(filename).load()) == sorted(names)
+    os.remove(filename)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+import shutil
+from os.path import abspath, exists, join
+
+from staticgenerator.staticgenerator.locks import PathLocks
+
+ROOT_DIR = join(abspath(os.curdir), "test_data", "locks")
+
+def test_lock_excludes_other_threads_until_released():
+    locks = PathLocks(ROOT_DIR)
+
+    assert locks.acquire(u"/blog/")
+    assert not locks.acquire(u"/blog/")
+    assert locks.acquire(u"/other/")
+
+    locks.release(u"/blog/")
+    assert locks.acquire(u"/blog/")
+
+    locks.release(u"/blog/")
+    locks.release(u"/other/")
+
+def test_lock_files_exclude_other_processes():
+    # Each PathLocks opens its own lock files, as another process would
+    locks, other = PathLocks(ROOT_DIR), PathLocks(ROOT_DIR)
+
+    assert locks.acquire("/blog/")
+    assert not other.acquire("/blog/")
+
+    locks.release("/blog/")
+    assert other.acquire("/blog/")
+    other.release("/blog/")
+
+def test_locks_without_directory_only_exclude_threads():
+    locks, other = PathLocks(), PathLocks()
+
+    assert locks.acquire("/blog/")
+    assert not locks.acquire("/blog/")
+    assert other.acquire("/blog/")
+
+def test_paths_share_a_fixed_number_of_lock_files():
+    if exists(ROOT_DIR):
+        shutil.rmtree(ROOT_DIR)
+    locks = PathLocks(ROOT_DIR, slots=2)
+    paths = ["/%d/" % i for i in range(10)]
+    slot = locks.get_slot(paths[0])
+    same = [path for path in paths[1:] if locks.get_slot(path) == slot]
+    other = [path for path in paths[1:] if locks.get_slot(path) != slot]
+
+    assert locks.acquire(paths[0])
+    assert not locks.acquire(same[0])
+    assert locks.acquire(other[0])
+
+    locks.release(same[0])
+    assert not locks.acquire(same[0]), "Releasing another path shouldn't release the slot"
+
+    locks.release(paths[0])
+    locks.release(other[0])
+    assert sorted(os.listdir(ROOT_DIR)) == ["0.lock", "1.lock"]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+import sqlite3
+from os.path import abspath, join
+
+from staticgenerator.staticgenerator.manifest import Manifest
+
+ROOT_DIR = join(abspath(os.curdir), "test_data")
+
+def get_manifest():
+    filename = join(ROOT_DIR, "manifest.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+    return Manifest(filename)
+
+def test_can_record_and_get_entry():
+    manifest = get_manifest()
+    manifest.record("/blog/", "/www/blog/index.html", 3, "digest", ("blog.post", 1))
+
+    entry = manifest.get("/blog/")
+
+    assert entry.path == "/blog/"
+    assert entry.filename == "/www/blog/index.html"
+    assert entry.size == 3
+    assert entry.digest == "digest"
+    assert (entry.model, entry.pk) == ("blog.post", "1")
+    assert entry.published > 0
+
+def test_get_returns_none_for_unknown_path():
+    manifest = get_manifest()
+    assert manifest.get("/unknown/") is None
+
+def test_can_remove_entry():
+    manifest = get_manifest()
+    manifest.record("/blog/", "/www/blog/index.html", 3)
+    manifest.remove("/blog/")
+
+    assert manifest.get("/blog/") is None
+
+def test_can_find_entries_by_prefix():
+    manifest = get_manifest()
+    for path in ("/", "/blog/", "/blog/2019/", "/blog/2019/post/", "/blogroll/", "/about/"):
+        manifest.record(path, "/www%sindex.html" % path, 1)
+
+    paths = [entry.path for entry in manifest.by_prefix("/blog/")]
+
+    assert paths == ["/blog/", "/blog/2019/", "/blog/2019/post/"]
+
+def test_can_find_entries_by_source():
+    manifest = get_manifest()
+    manifest.record("/blog/post/", "/www/blog/post/index.html", 1, source=("blog.post", 1))
+    manifest.record("/blog/post/amp/", "/www/blog/post/amp/index.html", 1, source=("blog.post", 1))
+    manifest.record("/blog/other/", "/www/blog/other/index.html", 1, source=("blog.post", 2))
+
+    paths = [entry.path for entry in manifest.by_source("blog.post", 1)]
+
+    assert paths == ["/blog/post/", "/blog/post/amp/"]
+
+def test_manifest_persists_across_instances():
+    manifest = get_manifest()
+    manifest.record("/blog/", "/www/blog/index.html", 3)
+
+    assert Manifest(manifest.filename).get("/blog/").size == 3
+
+def test_can_find_pages_depending_on_an_object():
+    manifest = get_manifest()
+    manifest.set_dependencies("/blog/", [("blog.post", 1), ("blog.post", 2)])
+    manifest.set_dependencies("/blog/1/", [("blog.post", 1)])
+    manifest.set_dependencies("/archive/", [("blog.post", u"*")])
+
+    assert manifest.dependents("blog.post", 1) == ["/archive/", "/blog/", "/blog/1/"]
+    assert manifest.dependents("blog.post", 3) == ["/archive/"]
+    assert manifest.dependencies("/blog/") == [("blog.post", "1"), ("blog.post", "2")]
+
+def test_dependencies_are_replaced_and_removed():
+    manifest = get_manifest()
+    manifest.set_dependencies("/blog/", [("blog.post", 1)])
+    manifest.set_dependencies("/blog/", [("blog.post", 2)])
+
+    assert manifest.dependents("blog.post", 1) == []
+    assert manifest.dependents("blog.post", 2) == ["/blog/"]
+
+    manifest.remove("/blog/")
+    assert manifest.dependencies("/blog/") == []
+
+def test_can_remove_many_entries():
+    manifest = get_manifest()
+    for path in ("/a/", "/b/", "/c/"):
+        manifest.record(path, "/www%sindex.html" % path, 3)
+    manifest.set_dependencies("/a/", [("blog.post", 1)])
+
+    manifest.remove_many(["/a/", "/b/"])
+
+    assert [entry.path for entry in manifest.all()] == ["/c/"]
+    assert manifest.dependents("blog.post", 1) == []
+
+def test_expiring_entries_can_be_claimed_once():
+    manifest = get_manifest()
+    manifest.record("/news/", "/www/news/index.html", 3, expires=100)
+    manifest.record("/sport/", "/www/sport/index.html", 3, expires=200)
+    manifest.record("/about/", "/www/about/index.html", 3)
+
+    entries = manifest.expiring(150)
+    assert [entry.path for entry in entries] == ["/news/"]
+
+    assert manifest.claim(entries[0], 300)
+    assert not manifest.claim(entries[0], 400)
+    assert manifest.get("/news/").expires == 300
+
+    manifest.set_expires("/news/", 500)
+    assert [entry.path for entry in manifest.expiring(450)] == ["/sport/"]
+
+def test_claims_can_be_released():
+    manifest = get_manifest()
+    manifest.record("/news/", "/www/news/index.html", 3, expires=100)
+    manifest.record("/sport/", "/www/sport/index.html", 3, expires=200)
+
+    news, sport = manifest.expiring(250)
+    assert manifest.claim(news, 300) and manifest.claim(sport, 300)
+
+    manifest.release(news, 300, 160)
+    manifest.set_expires("/sport/", 900)
+    manifest.release(sport, 300, 160)
+
+    assert manifest.get("/news/").expires == 160
+    assert manifest.get("/sport/").expires == 900
+
+def test_older_databases_are_migrated():
+    filename = join(ROOT_DIR, "manifest.db")
+    get_manifest()
+    connection = sqlite3.connect(filename)
+    connection.execute('''CREATE TABLE files (path TEXT PRIMARY KEY, filename TEXT NOT NULL,
+        size INTEGER NOT NULL, digest TEXT, model TEXT, pk TEXT, published REAL NOT NULL)''')
+    connection.execute("INSERT INTO files VALUES ('/old/', '/www/old/index.html', 3, NULL, NULL, NULL, 1)")
+    connection.commit()
+    connection.close()
+
+    manifest = Manifest(filename)
+
+    assert manifest.get("/old/").expires is None
+    manifest.set_expires("/old/", 10)
+    assert manifest.get("/old/").expires == 10
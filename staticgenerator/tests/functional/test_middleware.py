@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+from os.path import join
+
+from staticgenerator.staticgenerator.middleware import StaticGeneratorMiddleware
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import CustomSettings, Response
+
+WEB_ROOT = support.get_root_dir("middleware")
+
+class Request(object):
+    def __init__(self, path_info, query_string=''):
+        self.path_info = path_info
+        self.META = {'QUERY_STRING': query_string}
+
+def get_middleware():
+    support.reset(WEB_ROOT)
+    return StaticGeneratorMiddleware(CustomSettings(WEB_ROOT=WEB_ROOT,
+                                                    SERVER_NAME="example.com",
+                                                    STATIC_GENERATOR_URLS=(r'^/blog/',),
+                                                    STATIC_GENERATOR_VARIANT_PARAMS=('page', 'sort')))
+
+def published():
+    found = []
+    for directory, dirnames, filenames in os.walk(WEB_ROOT):
+        dirnames[:] = [name for name in dirnames if not name.startswith('.staticgenerator')]
+        found.extend(os.path.relpath(join(directory, name), WEB_ROOT) for name in filenames)
+    return sorted(found)
+
+def test_middleware_publishes_variants_to_their_own_files():
+    middleware = get_middleware()
+
+    middleware.process_response(Request("/blog/"), Response("page 1"))
+    middleware.process_response(Request("/blog/", "sort=new&page=3"), Response("page 3"))
+
+    assert published() == ["blog/index.html", "blog/index@page=3&sort=new.html"]
+    assert open(join(WEB_ROOT, "blog", "index@page=3&sort=new.html")).read() == "page 3"
+
+def test_middleware_skips_repeated_empty_and_unknown_parameters():
+    middleware = get_middleware()
+
+    # The view renders the last page=4, which must not become page=3's file
+    middleware.process_response(Request("/blog/", "page=3&page=4"), Response("page 4"))
+    middleware.process_response(Request("/blog/", "page="), Response("page 1"))
+    middleware.process_response(Request("/blog/", "filter=draft"), Response("drafts"))
+
+    assert published() == []
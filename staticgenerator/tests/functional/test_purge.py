@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import errno
+import os
+import shutil
+from os.path import exists, join
+
+from staticgenerator.staticgenerator import StaticGeneratorException
+from staticgenerator.staticgenerator.filesystem import FileSystem
+from staticgenerator.staticgenerator.tests.functional import support
+
+ROOT_DIR = support.get_root_dir("purge")
+
+FILES = (
+    "index.html",
+    "blog/index.html",
+    "blog/2019/index.html",
+    "blog/2019/index.html.gz",
+    "blog/2019/01/first/index.html",
+    "blog/2019/01/first/index.html.br",
+    "blog/2019/02/second/index.html",
+    "blog/2019/02/second/comments/index.html",
+    "blog/2020/index.html",
+    "blog/feed.xml",
+    ".staticgenerator-checkpoint",
+)
+
+def get_generator():
+    if exists(ROOT_DIR):
+        shutil.rmtree(ROOT_DIR)
+    for name in FILES:
+        filename = join(ROOT_DIR, name)
+        if not exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        open(filename, "w").close()
+
+    return support.get_generator(ROOT_DIR)
+
+def remaining():
+    found = []
+    for directory, dirnames, filenames in os.walk(ROOT_DIR):
+        found.extend(os.path.relpath(join(directory, name), ROOT_DIR) for name in filenames)
+    return sorted(found)
+
+def test_purge_prefix_removes_subtree_with_sidecars():
+    gen = get_generator()
+
+    purged = gen.purge("/blog/2019/")
+
+    assert purged == (4, 6, 6)
+    assert not exists(join(ROOT_DIR, "blog", "2019"))
+    assert remaining() == [".staticgenerator-checkpoint", "blog/2020/index.html", "blog/feed.xml",
+                           "blog/index.html", "index.html"]
+
+def test_purge_pattern_prunes_emptied_directories():
+    gen = get_generator()
+
+    purged = gen.purge(pattern="/blog/*/first/")
+
+    assert purged == (1, 2, 2)
+    assert not exists(join(ROOT_DIR, "blog", "2019", "01"))
+    assert exists(join(ROOT_DIR, "blog", "2019", "02", "second", "index.html"))
+
+def test_purge_partial_prefix():
+    gen = get_generator()
+
+    purged = gen.purge("/blog/20")
+
+    assert purged.paths == 5
+    assert remaining() == [".staticgenerator-checkpoint", "blog/feed.xml", "blog/index.html", "index.html"]
+
+def test_purge_of_missing_prefix_does_nothing():
+    gen = get_generator()
+    assert gen.purge("/missing/") == (0, 0, 0)
+
+class RacingFileSystem(FileSystem):
+    """Removes the files it lists, as a concurrent delete would"""
+
+    def scandir(self, directory):
+        entries = FileSystem.scandir(self, directory)
+        for name, is_directory in entries:
+            if name == "index.html":
+                os.remove(join(directory, name))
+        return entries
+
+def test_purge_tolerates_pages_deleted_meanwhile():
+    gen = get_generator()
+    gen.fs = RacingFileSystem()
+
+    purged = gen.purge("/blog/2019/")
+
+    assert purged.paths == 4
+    assert not exists(join(ROOT_DIR, "blog", "2019"))
+
+def test_purge_raises_when_unable_to_delete_file():
+    gen = get_generator()
+    def remove(path):
+        raise OSError(errno.EACCES, "Permission denied")
+    gen.fs.remove = remove
+
+    try:
+        gen.purge("/blog/2020/")
+    except StaticGeneratorException, e:
+        assert str(e) == "Could not delete file: %s" % join(ROOT_DIR, "blog", "2020", "index.html")
+    else:
+        assert False, "Shouldn't have gotten this far."
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+import shutil
+from multiprocessing import Process
+from os.path import exists, join
+
+from staticgenerator.staticgenerator.shards import merge, verify
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import RenderEngine, Response
+
+ROOT_DIR = support.get_root_dir("shards")
+PATHS = ['/'] + ['/page/%d/' % i for i in range(50)]
+COUNT = 4
+
+def render(path, query_string, meta):
+    return Response('content of %s' % path)
+
+def get_generator(web_root, **kw):
+    return support.get_generator(web_root, *PATHS, render_engine=RenderEngine(render), **kw)
+
+def build(web_root, shard):
+    get_generator(web_root, shard=shard).publish()
+
+def build_shards(roots):
+    if exists(ROOT_DIR):
+        shutil.rmtree(ROOT_DIR)
+    processes = [Process(target=build, args=(roots[i - 1], '%d/%d' % (i, COUNT))) for i in range(1, COUNT + 1)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+def test_shards_built_by_several_processes_cover_every_path():
+    web_root = join(ROOT_DIR, "www")
+    build_shards([web_root] * COUNT)
+
+    assert verify(get_generator(web_root)) == []
+
+    os.remove(join(web_root, "page", "7", "index.html"))
+    assert verify(get_generator(web_root)) == ['/page/7/']
+
+def test_shards_built_into_separate_roots_are_merged():
+    roots = [join(ROOT_DIR, "node%d" % i) for i in range(1, COUNT + 1)]
+    build_shards(roots)
+
+    gen = get_generator(join(ROOT_DIR, "www"))
+    assert verify(gen, roots) == []
+    assert len(verify(gen, roots[1:])) > 0
+
+    assert merge(roots, gen.web_root) == len(PATHS)
+    assert verify(gen) == []
+    assert open(join(gen.web_root, "page", "3", "index.html")).read() == 'content of /page/3/'
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import gzip
+import hashlib
+import os
+from os.path import join
+
+from staticgenerator.staticgenerator import StaticGeneratorException
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import RenderEngine, StreamingResponse
+
+ROOT_DIR = support.get_root_dir("streaming")
+
+def sitemap(count):
+    yield "<urlset>"
+    for i in range(count):
+        yield "<url><loc>http://example.com/%d/</loc></url>" % i
+    yield "</urlset>"
+
+def get_generator(responses, **kw):
+    support.reset(ROOT_DIR)
+    return support.get_generator(ROOT_DIR, render_engine=RenderEngine(responses), **kw)
+
+def test_streaming_response_is_written_chunk_by_chunk():
+    response = StreamingResponse(sitemap(1000))
+    gen = get_generator({"/sitemap.xml": response},
+                        compress=("gzip",),
+                        manifest=join(ROOT_DIR, ".staticgenerator-manifest"))
+
+    assert gen.publish_from_path("/sitemap.xml") is True
+
+    expected = "".join(sitemap(1000))
+    assert open(join(ROOT_DIR, "sitemap.xml")).read() == expected
+    assert gzip.GzipFile(join(ROOT_DIR, "sitemap.xml.gz")).read() == expected
+    assert not [name for name in os.listdir(ROOT_DIR) if name.startswith("tmp")]
+    assert response.closed
+
+    entry = gen.manifest.get(u"/sitemap.xml")
+    assert entry.size == len(expected)
+    assert entry.digest == hashlib.md5(expected).hexdigest()
+    assert entry.content_type == u"application/xml"
+
+def test_streaming_response_uses_index_file_of_its_content_type():
+    gen = get_generator({"/export/": StreamingResponse(iter(['{"rows": ', '[]}']), "application/json")})
+
+    gen.publish_from_path("/export/")
+
+    assert open(join(ROOT_DIR, "export", "index.json")).read() == '{"rows": []}'
+
+def test_unchanged_streaming_response_is_skipped():
+    gen = get_generator({}, skip_unchanged=True)
+    gen.render_engine.responses["/sitemap.xml"] = StreamingResponse(sitemap(10))
+    assert gen.publish_from_path("/sitemap.xml") is True
+    inode = os.stat(join(ROOT_DIR, "sitemap.xml")).st_ino
+
+    gen.render_engine.responses["/sitemap.xml"] = StreamingResponse(sitemap(10))
+    assert gen.publish_from_path("/sitemap.xml") is False
+
+    assert os.stat(join(ROOT_DIR, "sitemap.xml")).st_ino == inode
+    assert sorted(os.listdir(ROOT_DIR)) == ["sitemap.xml"]
+
+def test_failing_stream_leaves_published_file_alone():
+    def failing():
+        yield "<urlset>"
+        raise ValueError("database went away")
+
+    gen = get_generator({"/sitemap.xml": StreamingResponse(sitemap(10))}, compress=("gzip",))
+    gen.publish_from_path("/sitemap.xml")
+    gen.render_engine.responses["/sitemap.xml"] = StreamingResponse(failing())
+
+    try:
+        gen.publish_from_path("/sitemap.xml")
+    except StaticGeneratorException, e:
+        assert "database went away" in str(e)
+    else:
+        assert False, "Shouldn't have gotten this far."
+
+    assert open(join(ROOT_DIR, "sitemap.xml")).read() == "".join(sitemap(10))
+    assert sorted(os.listdir(ROOT_DIR)) == ["sitemap.xml", "sitemap.xml.gz"]
+
+def test_get_content_from_path_joins_streaming_content():
+    gen = get_generator({"/sitemap.xml": StreamingResponse(sitemap(2))})
+
+    assert gen.get_content_from_path("/sitemap.xml") == "".join(sitemap(2))
+
+def test_sidecars_are_renamed_before_the_page():
+    gen = get_generator({"/sitemap.xml": StreamingResponse(sitemap(10))}, compress=("gzip",))
+    renamed = []
+    rename_tempfile = gen.rename_tempfile
+    gen.rename_tempfile = lambda tmpname, filename: (renamed.append(filename), rename_tempfile(tmpname, filename))
+
+    gen.publish_from_path("/sitemap.xml")
+
+    assert renamed == [join(ROOT_DIR, "sitemap.xml.gz"), join(ROOT_DIR, "sitemap.xml")]
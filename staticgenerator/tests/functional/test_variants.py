@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import os
+from os.path import exists, join
+
+from staticgenerator.staticgenerator.tests.functional import support
+from staticgenerator.staticgenerator.tests.functional.support import CustomSettings, RenderEngine, Response
+
+ROOT_DIR = support.get_root_dir("variants")
+
+def render(path, query_string, meta):
+    return Response("%s %s %s" % (path, query_string, (meta or {}).get('HTTP_ACCEPT_LANGUAGE')))
+
+def get_generator(*resources):
+    support.reset(ROOT_DIR)
+    return support.get_generator(ROOT_DIR, *resources,
+                                 render_engine=RenderEngine(render),
+                                 settings=CustomSettings(WEB_ROOT=ROOT_DIR, SERVER_NAME="example.com",
+                                                         STATIC_GENERATOR_VARIANT_PARAMS=('page', 'sort'),
+                                                         STATIC_GENERATOR_VARIANT_HEADERS=('Accept-Language',)),
+                                 manifest=join(ROOT_DIR, ".staticgenerator-manifest"))
+
+def test_variants_are_rendered_and_published_to_their_own_files():
+    gen = get_generator("/blog/", "/blog/?sort=new&page=2", "/blog/?page=2&accept-language=fr")
+
+    gen.publish()
+
+    blog = join(ROOT_DIR, "blog")
+    assert open(join(blog, "index.html")).read() == "/blog/ None None"
+    assert open(join(blog, "index@page=2&sort=new.html")).read() == "/blog/ page=2&sort=new None"
+    assert open(join(blog, "index@accept-language=fr&page=2.html")).read() == "/blog/ page=2 fr"
+    assert gen.manifest.get(u"/blog/?page=2&sort=new").filename == join(blog, "index@page=2&sort=new.html")
+
+def test_delete_and_purge_variants():
+    long_path = "/blog/?sort=" + "x" * 200
+    gen = get_generator("/blog/", "/blog/?page=2", "/blog/?page=3", long_path, "/blog/2019/")
+    gen.publish()
+
+    gen.delete_from_path("/blog/?page=2")
+    assert not exists(join(ROOT_DIR, "blog", "index@page=2.html"))
+    assert exists(join(ROOT_DIR, "blog", "index.html"))
+
+    # ? matches any character in a pattern; bracketed, it only matches itself
+    purged = gen.purge("/blog/", "/blog/[?]*")
+
+    assert purged.paths == 2
+    assert sorted(os.listdir(join(ROOT_DIR, "blog"))) == ["2019", "index.html"]
+    assert exists(join(ROOT_DIR, "blog", "2019", "index.html"))
+    assert sorted(entry.path for entry in gen.manifest.all()) == [u"/blog/", u"/blog/2019/"]
+
+def test_variant_path_of_requests():
+    gen = get_generator()
+
+    assert gen.get_variant_path("/blog/", "", {}) == "/blog/"
+    assert gen.get_variant_path("/blog/", "page=3", {'HTTP_ACCEPT_LANGUAGE': 'fr'}) == "/blog/?accept-language=fr&page=3"
+    assert gen.get_variant_path("/blog/", "page=3&filter=draft", {}) is None
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import gzip
+from cStringIO import StringIO
+
+from staticgenerator.staticgenerator.compression import COMPRESSORS, get_compressors, gzip_compress, brotli
+
+def test_gzip_compress_round_trips():
+    content = "<html>%s</html>" % ("foo" * 100)
+    compressed = gzip_compress(content, 6)
+
+    assert len(compressed) < len(content)
+    assert gzip.GzipFile(fileobj=StringIO(compressed)).read() == content
+
+def test_gzip_compress_is_stable():
+    assert gzip_compress("foo", 9) == gzip_compress("foo", 9)
+
+def test_gzip_compressobj_round_trips_chunks():
+    chunks = ["<html>", "foo" * 100, "", "</html>"]
+    compressobj = COMPRESSORS['gzip'].compressobj(6)
+    compressed = "".join(compressobj.compress(chunk) for chunk in chunks) + compressobj.flush()
+
+    assert gzip.GzipFile(fileobj=StringIO(compressed)).read() == "".join(chunks)
+
+def test_get_compressors_skips_unavailable_brotli():
+    compressors = get_compressors(('gzip', 'brotli'))
+
+    extensions = [compressor.extension for compressor in compressors]
+    if brotli is None:
+        assert extensions == ['.gz']
+    else:
+        assert extensions == ['.gz', '.br']
+
+def test_get_compressors_raises_for_unknown_name():
+    try:
+        get_compressors(('lzma',))
+    except ValueError, e:
+        assert str(e) == 'Unknown compression "lzma". Choose one of: brotli, gzip'
+        return
+
+    assert False, "Shouldn't have gotten this far."
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator.crawler import extract_links
+
+def test_extract_links_keeps_same_site_paths():
+    content = '''
+        <a href="/blog/">Blog</a>
+        <a href="2/#comments">Next</a>
+        <a href="http://example.com/about/">About</a>
+        <a href="http://example.com:8000/contact/">Contact</a>
+        <a href="http://other.com/">Elsewhere</a>
+        <a href="mailto:someone@example.com">Mail</a>
+        <a href="/search/?q=django">Search</a>
+        <a href="/caf%C3%A9/">Cafe</a>
+        <a href="/../etc/">Out</a>
+        <a name="top">Top</a>
+        <link rel="alternate" type="application/rss+xml" href="/feeds/">
+        <link rel="stylesheet" href="/style.css">
+    '''
+
+    links = extract_links(content, '/blog/1/', ('example.com',))
+
+    assert links == [u'/blog/', u'/blog/1/2/', u'/about/', u'/contact/', u'/caf\xe9/', u'/feeds/']
+
+def test_extract_links_survives_broken_html():
+    assert extract_links('<a href="/a/">a</a><!-- <a', '/', ('example.com',)) == [u'/a/']
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator import dependencies
+
+class Meta(object):
+    app_label = 'blog'
+    object_name = 'Post'
+
+class Post(object):
+    _meta = Meta()
+
+    def __init__(self, pk):
+        self.pk = pk
+
+def test_recording_collects_loaded_instances():
+    with dependencies.Recording() as sources:
+        dependencies._instance_loaded(Post, Post(1))
+        dependencies._instance_loaded(Post, Post(2))
+        dependencies._instance_loaded(Post, Post(1))
+        dependencies._instance_loaded(Post, Post(None))
+
+    assert sources == set([('blog.post', u'1'), ('blog.post', u'2')])
+
+def test_nothing_is_recorded_outside_recordings():
+    dependencies._instance_loaded(Post, Post(1))
+    dependencies.depends_on(Post(1))
+
+    assert dependencies.stop() == set()
+
+def test_depends_on_records_instances_and_whole_models():
+    dependencies.start()
+    dependencies.depends_on(Post(3), Post)
+
+    assert dependencies.stop() == set([('blog.post', u'3'), ('blog.post', dependencies.ANY)])
+
+def test_null_recording_records_nothing():
+    with dependencies.NULL_RECORDING as sources:
+        dependencies._instance_loaded(Post, Post(1))
+
+    assert sources is None
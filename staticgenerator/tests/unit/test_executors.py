@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import threading
+import time
+
+from staticgenerator.staticgenerator import executors
+from staticgenerator.staticgenerator.executors import get_executor, SerialExecutor, ThreadExecutor, ProcessExecutor
+
+def double(path):
+    if path == 'bad':
+        raise ValueError('bad path')
+    return path * 2
+
+def test_get_executor_by_name():
+    assert isinstance(get_executor('serial'), SerialExecutor)
+    assert isinstance(get_executor('thread', 3), ThreadExecutor)
+    assert isinstance(get_executor('process', 2), ProcessExecutor)
+    assert get_executor('thread', 3).workers == 3
+
+def test_get_executor_raises_for_unknown_name():
+    try:
+        get_executor('fibers')
+    except ValueError, e:
+        assert str(e) == 'Unknown executor "fibers". Choose one of: process, serial, thread'
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
+def test_executors_keep_order_and_capture_errors():
+    paths = ['a', 'bad', 'c', 'd', 'e']
+
+    for name in ('serial', 'thread', 'process'):
+        outcomes = list(get_executor(name, 2).imap(double, paths))
+
+        assert [outcome.path for outcome in outcomes] == paths
+        assert [outcome.value for outcome in outcomes] == ['aa', None, 'cc', 'dd', 'ee']
+        assert [outcome.ok for outcome in outcomes] == [True, False, True, True, True]
+        assert str(outcomes[1].error) == 'bad path'
+
+def test_closing_early_stops_the_pool():
+    ran = []
+    def slow(path):
+        ran.append(path)
+        time.sleep(0.01)
+        return path
+
+    threads = threading.active_count()
+    outcomes = get_executor('thread', 2).imap(slow, range(64))
+    assert next(outcomes).path == 0
+    outcomes.close()
+
+    assert len(ran) < 32, "The rest of the batch shouldn't have run"
+    assert threading.active_count() == threads
+
+def test_process_workers_do_not_share_database_connections():
+    closed = []
+    class Pool(object):
+        def __init__(self, workers, initializer=None):
+            self.initializer = initializer
+
+    close_connections = executors.close_connections
+    executors.close_connections = lambda: closed.append(True)
+    try:
+        executor = ProcessExecutor(2)
+        executor.pool_class = Pool
+        pool = executor.create_pool()
+    finally:
+        executors.close_connections = close_connections
+
+    assert closed == [True], "The parent's connections should be closed before forking"
+    pool.initializer()
+    assert closed == [True, True]
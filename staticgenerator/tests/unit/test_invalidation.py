@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator import StaticGenerator
+from staticgenerator.staticgenerator.invalidation import Invalidator, flush_all
+
+class CustomSettings(object):
+    def __init__(self, **kw):
+        for k,v in kw.iteritems():
+            setattr(self, k, v)
+
+class FakeConnection(object):
+    def __init__(self):
+        self.in_atomic_block = False
+        self.run_on_commit = []
+
+class FakeTransaction(object):
+    """Just enough of django.db.transaction to commit and roll back"""
+
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    def get_connection(self, using=None):
+        return self.connection
+
+    def on_commit(self, func, using=None):
+        self.connection.run_on_commit.append((set(), func))
+
+    def begin(self):
+        self.connection.in_atomic_block = True
+
+    def commit(self):
+        callbacks, self.connection.run_on_commit = self.connection.run_on_commit, []
+        self.connection.in_atomic_block = False
+        for sids, func in callbacks:
+            func()
+
+    def rollback(self):
+        self.connection.run_on_commit = []
+        self.connection.in_atomic_block = False
+
+class RecordingInvalidator(Invalidator):
+    def __init__(self, **kw):
+        self.executed = []
+        Invalidator.__init__(self, generator=StaticGenerator,
+                             model_base=object, manager=object, model=object, queryset=object,
+                             settings=CustomSettings(WEB_ROOT="test_web_root"), **kw)
+
+    def execute(self, action, paths):
+        self.executed.append((action, paths))
+
+def test_paths_are_handled_once_when_the_transaction_commits():
+    transaction = FakeTransaction()
+    invalidator = RecordingInvalidator(transaction=transaction)
+
+    transaction.begin()
+    invalidator.delete('/a/', '/')
+    invalidator.delete('/b/', '/')
+    invalidator.publish('/a/')
+    assert invalidator.executed == []
+
+    transaction.commit()
+    assert invalidator.executed == [('delete', ['/b/', '/']), ('publish', ['/a/'])]
+
+def test_paths_are_dropped_when_the_transaction_rolls_back():
+    transaction = FakeTransaction()
+    invalidator = RecordingInvalidator(transaction=transaction)
+
+    transaction.begin()
+    invalidator.delete('/a/')
+    transaction.rollback()
+
+    transaction.begin()
+    invalidator.delete('/b/')
+    transaction.commit()
+
+    assert invalidator.executed == [('delete', ['/b/'])]
+
+def test_paths_are_handled_right_away_outside_transactions():
+    invalidator = RecordingInvalidator(transaction=FakeTransaction())
+
+    invalidator.delete('/a/', '/a/')
+
+    assert invalidator.executed == [('delete', ['/a/'])]
+
+def test_paths_are_collected_for_the_debounce_window():
+    invalidator = RecordingInvalidator(transaction=FakeTransaction(), delay=60)
+
+    invalidator.delete('/a/')
+    invalidator.delete('/a/', '/b/')
+    assert invalidator.executed == []
+    timer = invalidator.timer
+
+    invalidator.flush()
+    assert invalidator.executed == [('delete', ['/a/', '/b/'])]
+    timer.join(1)
+    assert not timer.is_alive()
+
+    invalidator.flush()
+    assert len(invalidator.executed) == 1
+
+def test_waiting_paths_are_flushed_at_exit():
+    invalidator = RecordingInvalidator(transaction=FakeTransaction(), delay=60)
+    invalidator.publish('/a/')
+
+    flush_all()
+
+    assert invalidator.executed == [('publish', ['/a/'])]
+    assert invalidator.timer is None
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator.matcher import URLMatcher, LRUCache, combine
+
+def test_matcher_matches_any_pattern():
+    matcher = URLMatcher((r'^/$', r'^/blog', r'^/about/(\w+)/$'))
+
+    assert matcher.match('/')
+    assert matcher.match('/blog/some-post/')
+    assert matcher.match('/about/me/')
+    assert not matcher.match('/contact/')
+    assert not matcher.match('/about/')
+
+def test_matcher_combines_patterns_into_one_regex():
+    assert len(combine((r'^/$', r'^/blog', r'^/about/(\w+)/$'))) == 1
+
+def test_matcher_keeps_backreferences_and_inline_flags_apart():
+    regexes = combine((r'^/$', r'^/(\w+)/\1/$', r'(?i)^/News'))
+
+    assert len(regexes) == 3
+
+    matcher = URLMatcher((r'^/$', r'^/(\w+)/\1/$', r'(?i)^/News'))
+    assert matcher.match('/foo/foo/')
+    assert not matcher.match('/foo/bar/')
+    assert matcher.match('/news/')
+
+def test_matcher_splits_patterns_with_many_groups():
+    patterns = [r'^/section%d/(\d+)/(\d+)/$' % i for i in range(100)]
+    matcher = URLMatcher(patterns)
+
+    assert len(matcher.regexes) == 3
+    assert matcher.match('/section99/1/2/')
+
+def test_matcher_falls_back_when_group_names_clash():
+    matcher = URLMatcher((r'^/blog/(?P<slug>\w+)/$', r'^/pages/(?P<slug>\w+)/$'))
+
+    assert len(matcher.regexes) == 2
+    assert matcher.match('/pages/about/')
+
+def test_matcher_caches_decisions():
+    matcher = URLMatcher((r'^/blog',))
+    matcher.match('/blog/')
+    matcher.regexes = ()
+
+    assert matcher.match('/blog/')
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert len(cache) == 2
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import time
+
+from mox import Mox, IgnoreArg
+
+from staticgenerator.staticgenerator import StaticGeneratorException
+from staticgenerator.staticgenerator.refresher import Refresher
+
+class Entry(object):
+    def __init__(self, path, expires):
+        self.path = path
+        self.expires = expires
+
+def test_refresher_republishes_claimed_pages():
+    mox = Mox()
+    generator = mox.CreateMockAnything()
+    generator.manifest = mox.CreateMockAnything()
+
+    mine, taken = Entry(u'/news/', 10), Entry(u'/sport/', 20)
+    generator.manifest.expiring(IgnoreArg(), 100).AndReturn([mine, taken])
+    generator.manifest.claim(mine, IgnoreArg()).AndReturn(True)
+    generator.publish_from_path(u'/news/')
+    generator.manifest.claim(taken, IgnoreArg()).AndReturn(False)
+
+    mox.ReplayAll()
+
+    assert Refresher(generator).refresh() == 1
+    mox.VerifyAll()
+
+def test_refresher_deletes_pages_that_are_gone():
+    mox = Mox()
+    generator = mox.CreateMockAnything()
+    generator.manifest = mox.CreateMockAnything()
+
+    entry = Entry(u'/gone/', 10)
+    generator.manifest.expiring(IgnoreArg(), 100).AndReturn([entry])
+    generator.manifest.claim(entry, IgnoreArg()).AndReturn(True)
+    generator.publish_from_path(u'/gone/').AndRaise(StaticGeneratorException('returned http code 410', status_code=410))
+    generator.delete_from_path(u'/gone/')
+
+    mox.ReplayAll()
+
+    assert Refresher(generator).refresh() == 1
+    mox.VerifyAll()
+
+def test_refresher_keeps_pages_failing_for_other_reasons():
+    mox = Mox()
+    generator = mox.CreateMockAnything()
+    generator.manifest = mox.CreateMockAnything()
+
+    failing, broken = Entry(u'/news/', 10), Entry(u'/sport/', 20)
+    generator.manifest.expiring(IgnoreArg(), 100).AndReturn([failing, broken])
+    generator.manifest.claim(failing, IgnoreArg()).AndReturn(True)
+    generator.publish_from_path(u'/news/').AndRaise(StaticGeneratorException('returned http code 500', status_code=500))
+    generator.manifest.release(failing, IgnoreArg(), IgnoreArg())
+    generator.manifest.claim(broken, IgnoreArg()).AndReturn(True)
+    generator.publish_from_path(u'/sport/').AndRaise(ValueError('database went away'))
+    generator.manifest.release(broken, IgnoreArg(), IgnoreArg())
+
+    mox.ReplayAll()
+
+    assert Refresher(generator).refresh() == 0
+    mox.VerifyAll()
+
+class FailingGenerator(object):
+    """Every page of the manifest is due, and none of them renders"""
+
+    def __init__(self, paths):
+        self.manifest = self
+        self.entries = [Entry(path, 10) for path in paths]
+        self.attempts = 0
+
+    def expiring(self, before, limit):
+        return self.entries[:limit]
+
+    def claim(self, entry, until):
+        return True
+
+    def release(self, entry, until, expires):
+        pass
+
+    def publish_from_path(self, path):
+        self.attempts += 1
+        raise StaticGeneratorException('returned http code 500', status_code=500)
+
+def test_failing_batch_waits_for_the_next_interval():
+    generator = FailingGenerator([u'/a/', u'/b/', u'/c/'])
+    refresher = Refresher(generator, interval=0.05, batch_size=3)
+
+    refresher.start()
+    time.sleep(0.3)
+    refresher.stop()
+
+    assert 0 < generator.attempts <= 3 * 7
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator.shards import parse_shard, shard_of
+
+def test_parse_shard():
+    assert parse_shard('3/16') == (3, 16)
+    assert parse_shard((1, 1)) == (1, 1)
+
+def test_parse_shard_rejects_invalid_specs():
+    for spec in ('3', '0/16', '17/16', 'a/b', (2, 1)):
+        try:
+            parse_shard(spec)
+        except ValueError:
+            continue
+        assert False, "%r should have been rejected" % (spec,)
+
+def test_shards_split_paths_stably_and_evenly():
+    paths = ['/page/%d/' % i for i in range(1000)]
+    shards = [shard_of(path, 4) for path in paths]
+
+    assert shards == [shard_of(path, 4) for path in paths]
+    assert shard_of(u'/caf\xe9/', 4) == shard_of(u'/caf\xe9/'.encode('utf-8'), 4)
+    for shard in (1, 2, 3, 4):
+        assert 200 < shards.count(shard) < 300
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 #-*- coding:utf-8 -*-
 
+import errno
+from datetime import datetime
+import hashlib
 import stat
+import threading
+import time
 
-from mox import Mox
+from mox import Mox, IgnoreArg
 
-from staticgenerator.staticgenerator import StaticGenerator, StaticGeneratorException, DummyHandler
+from staticgenerator.staticgenerator import StaticGenerator, StaticGeneratorException, DummyHandler, RenderEngine
+from staticgenerator.staticgenerator.compression import gzip_compress
+from staticgenerator.staticgenerator.stats import Stats
 import staticgenerator.staticgenerator
 
 class CustomSettings(object):
@@ -13,6 +20,19 @@ class CustomSettings(object):
         for k,v in kw.iteritems():
             setattr(self, k, v)
 
+class FakeResponse(dict):
+    """A response with headers, looked up like HttpResponse's"""
+    status_code = 200
+
+    def __init__(self, content, content_type='text/html; charset=utf-8'):
+        dict.__init__(self, {'Content-Type': content_type})
+        self.content = content
+
+def expect_unused_sidecars(fs_mock, filename, extensions=(".br", ".gz")):
+    """Expects the checks for sidecars that are not on disk"""
+    for extension in extensions:
+        fs_mock.exists(filename + extension).AndReturn(False)
+
 def get_mocks(mox):
     http_request_mock = mox.CreateMockAnything()
     model_base_mock = mox.CreateMockAnything()
@@ -235,6 +255,262 @@ def test_extract_resources_when_resource_is_a_model_base():
     assert instance.resources[1] == 'some_url2'
     mox.VerifyAll()
     
+class FakeQuerySet(object):
+    """Just enough of a QuerySet to be walked lazily, with the queries it ran"""
+
+    def __init__(self, objs, queries=None, ordered=False):
+        self.objs = objs
+        self.queries = queries if queries is not None else []
+        self.ordered = ordered
+        self.query = self
+
+    def can_filter(self):
+        return True
+
+    def iterator(self):
+        self.queries.append('iterator')
+        return iter(self.objs)
+
+    def __iter__(self):
+        raise AssertionError("Lazy generators must not fill the result cache")
+
+    def order_by(self, field):
+        return FakeQuerySet(sorted(self.objs, key=lambda obj: obj.pk), self.queries, True)
+
+    def filter(self, pk__gt):
+        return FakeQuerySet([obj for obj in self.objs if obj.pk > pk__gt], self.queries, self.ordered)
+
+    def __getitem__(self, s):
+        self.queries.append('chunk')
+        return self.objs[s]
+
+    def values_list(self, *fields):
+        self.queries.append('values_list%r' % (fields,))
+        rows = [tuple([getattr(obj, field) for field in fields]) for obj in self.objs]
+        return FakeValuesQuerySet(rows, self.queries)
+
+class FakeValuesQuerySet(FakeQuerySet):
+    def order_by(self, field):
+        return FakeValuesQuerySet(sorted(self.objs), self.queries, True)
+
+    def filter(self, pk__gt):
+        return FakeValuesQuerySet([row for row in self.objs if row[0] > pk__gt], self.queries, self.ordered)
+
+class FakeModelBase(object):
+    pass
+
+class FakeManager(object):
+    pass
+
+class FakeObject(object):
+    def __init__(self, pk):
+        self.pk = pk
+        self.slug = 'slug-%d' % pk
+
+    def get_absolute_url(self):
+        return '/objects/%d/' % self.pk
+
+def test_lazy_resources_are_extracted_on_iteration():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    queries = []
+    resource = FakeQuerySet([FakeObject(1), FakeObject(2)], queries)
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("/", resource,
+                               http_request=http_request,
+                               model_base=FakeModelBase,
+                               manager=FakeManager,
+                               model=FakeObject,
+                               queryset=FakeQuerySet,
+                               settings=settings,
+                               lazy=True)
+
+    assert queries == []
+    assert list(instance.resources) == ['/', '/objects/1/', '/objects/2/']
+    assert queries == ['iterator']
+    mox.VerifyAll()
+
+def test_lazy_resources_are_read_in_chunks():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root", STATIC_GENERATOR_CHUNK_SIZE=2)
+
+    queries = []
+    resource = FakeQuerySet([FakeObject(pk) for pk in (5, 3, 1, 4, 2)], queries)
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(resource,
+                               http_request=http_request,
+                               model_base=FakeModelBase,
+                               manager=FakeManager,
+                               model=FakeObject,
+                               queryset=FakeQuerySet,
+                               settings=settings,
+                               lazy=True)
+
+    assert list(instance.resources) == ['/objects/%d/' % pk for pk in (1, 2, 3, 4, 5)]
+    assert queries == ['chunk', 'chunk', 'chunk']
+    mox.VerifyAll()
+
+def test_registered_urls_are_built_from_values():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root", STATIC_GENERATOR_CHUNK_SIZE=2)
+
+    queries = []
+    resource = FakeQuerySet([FakeObject(pk) for pk in (3, 1, 2)], queries)
+    resource.model = FakeObject
+
+    mox.ReplayAll()
+
+    for builder in ('/slugs/%(slug)s/', lambda slug: '/slugs/%s/' % slug):
+        del queries[:]
+        instance = StaticGenerator(resource,
+                                   http_request=http_request,
+                                   model_base=FakeModelBase,
+                                   manager=FakeManager,
+                                   model=FakeObject,
+                                   queryset=FakeQuerySet,
+                                   settings=settings,
+                                   lazy=True,
+                                   url_builders={FakeObject: (('slug',), builder)})
+
+        assert list(instance.resources) == ['/slugs/slug-1/', '/slugs/slug-2/', '/slugs/slug-3/']
+        assert queries == ["values_list('pk', 'slug')", 'chunk', 'chunk']
+
+    mox.VerifyAll()
+
+class FakeModifiedQuerySet(FakeQuerySet):
+    def filter(self, **kw):
+        self.queries.append('filter%r' % (kw,))
+        return FakeModifiedQuerySet(self.objs[1:], self.queries)
+
+def test_incremental_builds_only_extract_modified_rows():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    build_state = mox.CreateMockAnything()
+    build_state.get('default').AndReturn(0)
+    build_state.set('default', IgnoreArg())
+
+    queries = []
+    resource = FakeModifiedQuerySet([FakeObject(1), FakeObject(2)], queries)
+    resource.model = FakeObject
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(resource,
+                               http_request=http_request,
+                               model_base=FakeModelBase,
+                               manager=FakeManager,
+                               model=FakeObject,
+                               queryset=FakeQuerySet,
+                               settings=settings,
+                               lazy=True,
+                               incremental=True,
+                               modified_field='updated',
+                               always_rebuild=('/',),
+                               build_state=build_state)
+    instance.publish_from_path = lambda path: True
+
+    results = instance.publish()
+
+    assert results.total == 2
+    assert queries[0] == "filter{'updated__gt': %r}" % datetime.fromtimestamp(0)
+    mox.VerifyAll()
+
+def test_failed_incremental_builds_are_not_remembered():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    build_state = mox.CreateMockAnything()
+    build_state.get('default').AndReturn(None)
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               incremental=True,
+                               always_rebuild=('/',),
+                               build_state=build_state,
+                               fail_silently=True)
+
+    def publish_from_path(path):
+        raise StaticGeneratorException("failed")
+    instance.publish_from_path = publish_from_path
+
+    assert instance.since is None
+    assert len(instance.publish().failed) == 1
+    mox.VerifyAll()
+
+def test_lazy_results_only_keep_failures():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("/a/", "/b/", "/c/",
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               lazy=True,
+                               fail_silently=True)
+
+    def func(path):
+        if path == "/b/":
+            raise StaticGeneratorException("failed")
+        return True
+
+    results = instance.do_all(func)
+
+    assert results.total == 3
+    assert results.written == 2
+    assert [outcome.path for outcome in results] == ["/b/"]
+    mox.VerifyAll()
+
+def test_generator_records_phases_and_failures_in_stats():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    stats = mox.CreateMockAnything()
+    stats.timer('extract', None).AndReturn(Stats().timer('extract', None))
+    stats.fail("some_path_2", IgnoreArg())
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("some_path_1", "some_path_2",
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               stats=stats,
+                               fail_silently=True)
+
+    def func(path):
+        if path == "some_path_2":
+            raise StaticGeneratorException("failed")
+
+    instance.do_all(func)
+    mox.VerifyAll()
+
 def test_get_content_from_path():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
@@ -250,6 +526,7 @@ def test_get_content_from_path():
     response_mock = mox.CreateMockAnything()
     response_mock.content = 'foo'
     response_mock.status_code = 200
+    response_mock.streaming = False
 
     http_request.__call__().AndReturn(request_mock)
     
@@ -361,21 +638,27 @@ def test_publish_raises_when_unable_to_create_folder():
 
     assert False, "Shouldn't have gotten this far."
 
-def test_publish_raises_when_unable_to_create_temp_file():
+def test_publish_tolerates_directory_created_concurrently():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
     fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root").AndReturn(True)
+    fs_mock.exists("test_web_root").AndReturn(False)
+    fs_mock.makedirs("test_web_root").AndRaise(OSError(errno.EEXIST, "File exists"))
 
-    fs_mock.tempfile(directory="test_web_root").AndRaise(ValueError())
+    f = mox.CreateMockAnything()
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
 
     mox.ReplayAll()
-    
+
     instance = StaticGenerator(http_request=http_request,
                                model_base=model_base,
                                manager=manager,
@@ -384,30 +667,26 @@ def test_publish_raises_when_unable_to_create_temp_file():
                                settings=settings,
                                fs=fs_mock)
 
-    try:
-        instance.publish_from_path("some_path", content="some_content")
-    except StaticGeneratorException, e:
-        assert str(e) == 'Could not create the file: test_web_root/some_path'
-        mox.VerifyAll()
-        return
-
-    assert False, "Shouldn't have gotten this far."
+    instance.publish_from_path("some_path", content="some_content")
+    assert "test_web_root" in instance.directories
+    mox.VerifyAll()
 
-def test_publish_from_path():
+def test_publish_recreates_directory_removed_behind_its_back():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
     fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root").AndReturn(True)
+    fs_mock.tempfile(directory="test_web_root").AndRaise(OSError(errno.ENOENT, "No such file or directory"))
+    fs_mock.exists("test_web_root").AndReturn(False)
+    fs_mock.makedirs("test_web_root")
 
     f = mox.CreateMockAnything()
-    filename = "some_temp_file"
-    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
     fs_mock.write(f, "some_content")
     fs_mock.close(f)
-    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
     fs_mock.rename('some_temp_file', 'test_web_root/some_path')
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
@@ -421,21 +700,21 @@ def test_publish_from_path():
                                queryset=queryset,
                                settings=settings,
                                fs=fs_mock)
+    instance.directories.add("test_web_root")
 
     instance.publish_from_path("some_path", content="some_content")
-
     mox.VerifyAll()
 
-def test_delete_raises_when_unable_to_delete_file():
+def test_publish_raises_when_unable_to_create_temp_file():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
-
     fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root/some_path").AndReturn(True)
-    fs_mock.remove("test_web_root/some_path").AndRaise(ValueError())
+    fs_mock.exists("test_web_root").AndReturn(True)
+
+    fs_mock.tempfile(directory="test_web_root").AndRaise(ValueError())
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
 
@@ -450,31 +729,35 @@ def test_delete_raises_when_unable_to_delete_file():
                                fs=fs_mock)
 
     try:
-        instance.delete_from_path("some_path")
+        instance.publish_from_path("some_path", content="some_content")
     except StaticGeneratorException, e:
-        assert str(e) == 'Could not delete file: test_web_root/some_path'
+        assert str(e) == 'Could not create the file: test_web_root/some_path'
         mox.VerifyAll()
         return
 
     assert False, "Shouldn't have gotten this far."
 
-def test_delete_ignores_folder_delete_when_unable_to_delete_folder():
+def test_publish_from_path():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
-
     fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root/some_path").AndReturn(True)
-    fs_mock.remove("test_web_root/some_path")
+    fs_mock.exists("test_web_root").AndReturn(True)
 
-    fs_mock.rmdir("test_web_root").AndRaise(OSError())
+    f = mox.CreateMockAnything()
+    filename = "some_temp_file"
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
 
     mox.ReplayAll()
-    
+
     instance = StaticGenerator(http_request=http_request,
                                model_base=model_base,
                                manager=manager,
@@ -483,21 +766,19 @@ def test_delete_ignores_folder_delete_when_unable_to_delete_folder():
                                settings=settings,
                                fs=fs_mock)
 
-    instance.delete_from_path("some_path")
+    instance.publish_from_path("some_path", content="some_content")
 
-    assert True, "Should work even when raising OSError"
+    mox.VerifyAll()
 
-def test_delete_from_path():
+def test_publish_skips_unchanged_content():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
     fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root/some_path").AndReturn(True)
-    fs_mock.remove("test_web_root/some_path")
-
-    fs_mock.rmdir("test_web_root")
+    fs_mock.getsize("test_web_root/some_path").AndReturn(len("some_content"))
+    fs_mock.digest("test_web_root/some_path").AndReturn(hashlib.md5("some_content").hexdigest())
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
 
@@ -509,95 +790,524 @@ def test_delete_from_path():
                                model=model,
                                queryset=queryset,
                                settings=settings,
-                               fs=fs_mock)
-
-    instance.delete_from_path("some_path")
+                               fs=fs_mock,
+                               skip_unchanged=True)
 
+    assert instance.publish_from_path("some_path", content="some_content") is False
     mox.VerifyAll()
 
-def test_publish_loops_through_all_resources():
+def test_publish_writes_changed_content_when_skipping_unchanged():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
-    f = mox.CreateMockAnything()
-    fs_mock.join('test_web_root', 'some_path_1').AndReturn('test_web_root/some_path_1')
-    fs_mock.dirname('test_web_root/some_path_1').AndReturn('test_web_root')
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.getsize("test_web_root/some_path").AndReturn(len("some_content"))
+    fs_mock.digest("test_web_root/some_path").AndReturn(hashlib.md5("other_content").hexdigest())
     fs_mock.exists("test_web_root").AndReturn(True)
-    filename = "some_temp_file"
-    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
-    fs_mock.write(f, "some_content")
-    fs_mock.close(f)
-    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
-    fs_mock.rename('some_temp_file', 'test_web_root/some_path_1')
 
-    fs_mock.join('test_web_root', 'some_path_2').AndReturn('test_web_root/some_path_2')
-    fs_mock.dirname('test_web_root/some_path_2').AndReturn('test_web_root')
-    fs_mock.exists("test_web_root").AndReturn(True)
-    filename = "some_temp_file"
-    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
+    f = mox.CreateMockAnything()
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
     fs_mock.write(f, "some_content")
     fs_mock.close(f)
-    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
-    fs_mock.rename('some_temp_file', 'test_web_root/some_path_2')
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
 
-    settings = CustomSettings(WEB_ROOT="test_web_root")
+    settings = CustomSettings(WEB_ROOT="test_web_root", STATIC_GENERATOR_SKIP_UNCHANGED=True)
 
     mox.ReplayAll()
 
-    try:
-        get_content_from_path = StaticGenerator.get_content_from_path
-        StaticGenerator.get_content_from_path = lambda self, path: "some_content"
-        instance = StaticGenerator("some_path_1", "some_path_2",
-                                   http_request=http_request,
-                                   model_base=model_base,
-                                   manager=manager,
-                                   model=model,
-                                   queryset=queryset,
-                                   settings=settings,
-                                   fs=fs_mock)
-
-        instance.publish()
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
 
-        mox.VerifyAll()
-    finally:
-        StaticGenerator.get_content_from_path = get_content_from_path
+    assert instance.publish_from_path("some_path", content="some_content") is True
+    mox.VerifyAll()
 
-def test_delete_loops_through_all_resources():
+def test_publish_writes_gzip_sidecar():
     mox = Mox()
     http_request, model_base, manager, model, queryset = get_mocks(mox)
 
     fs_mock = mox.CreateMockAnything()
-    fs_mock.join('test_web_root', 'some_path').AndReturn("test_web_root/some_path")
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
     fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
-    fs_mock.exists("test_web_root/some_path").AndReturn(True)
-    fs_mock.remove("test_web_root/some_path")
-    fs_mock.rmdir("test_web_root")
+    fs_mock.exists("test_web_root").AndReturn(True)
 
-    fs_mock.join('test_web_root', 'some_path_2').AndReturn("test_web_root/some_path_2")
-    fs_mock.dirname('test_web_root/some_path_2').AndReturn("test_web_root")
-    fs_mock.exists("test_web_root/some_path_2").AndReturn(True)
-    fs_mock.remove("test_web_root/some_path_2")
-    fs_mock.rmdir("test_web_root")
+    f = mox.CreateMockAnything()
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file_gz"])
+    fs_mock.write(f, gzip_compress("some_content", 6))
+    fs_mock.close(f)
+    fs_mock.chmod("some_temp_file_gz", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file_gz', 'test_web_root/some_path.gz')
+
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
 
     settings = CustomSettings(WEB_ROOT="test_web_root")
 
     mox.ReplayAll()
 
-    instance = StaticGenerator("some_path", "some_path_2", 
-                               http_request=http_request,
+    instance = StaticGenerator(http_request=http_request,
                                model_base=model_base,
                                manager=manager,
                                model=model,
                                queryset=queryset,
                                settings=settings,
-                               fs=fs_mock)
-
-    instance.delete()
+                               fs=fs_mock,
+                               compress=('gzip',),
+                               compress_level=6,
+                               compress_min_size=0)
 
+    instance.publish_from_path("some_path", content="some_content")
     mox.VerifyAll()
-    
-def test_can_create_dummy_handler():
+
+def test_publish_removes_sidecar_below_minimum_size():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root").AndReturn(True)
+
+    fs_mock.exists("test_web_root/some_path.gz").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path.gz")
+
+    f = mox.CreateMockAnything()
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
+
+    settings = CustomSettings(WEB_ROOT="test_web_root",
+                              STATIC_GENERATOR_COMPRESS=('gzip',),
+                              STATIC_GENERATOR_COMPRESS_MIN_SIZE=1024)
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
+
+    instance.publish_from_path("some_path", content="some_content")
+    mox.VerifyAll()
+
+def test_delete_removes_sidecars():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path")
+    fs_mock.exists("test_web_root/some_path.br").AndReturn(False)
+    fs_mock.exists("test_web_root/some_path.gz").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path.gz")
+    fs_mock.rmdir("test_web_root")
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock,
+                               compress=('gzip',))
+
+    instance.delete_from_path("some_path")
+    mox.VerifyAll()
+
+def test_publish_records_file_in_manifest():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root").AndReturn(True)
+
+    f = mox.CreateMockAnything()
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, "some_temp_file"])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod("some_temp_file", stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path')
+
+    manifest_mock = mox.CreateMockAnything()
+    manifest_mock.record("some_path", "test_web_root/some_path", 12, hashlib.md5("some_content").hexdigest(), None, None, None)
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock,
+                               manifest=manifest_mock)
+
+    instance.publish_from_path("some_path", content="some_content")
+    mox.VerifyAll()
+
+def test_publish_records_expiry_of_pages_with_ttl():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "news/index.html").AndReturn("test_web_root/news/index.html")
+    fs_mock.dirname("test_web_root/news/index.html").AndReturn("test_web_root/news")
+    fs_mock.getsize("test_web_root/news/index.html").AndReturn(12)
+
+    entry = mox.CreateMockAnything()
+    entry.filename = u"test_web_root/news/index.html"
+    entry.size = 12
+    entry.digest = hashlib.md5("some_content").hexdigest()
+
+    manifest_mock = mox.CreateMockAnything()
+    manifest_mock.get("/news/").AndReturn(entry)
+    manifest_mock.set_expires("/news/", IgnoreArg())
+
+    settings = CustomSettings(WEB_ROOT="test_web_root", STATIC_GENERATOR_TTLS=((r'^/sport/', 10), (r'^/news/', 60)))
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock,
+                               manifest=manifest_mock,
+                               skip_unchanged=True)
+
+    assert instance.publish_from_path("/news/", content="some_content") is False
+    assert 59 < instance.get_expires("/news/") - time.time() <= 60
+    assert instance.get_expires("/about/") is None
+    mox.VerifyAll()
+
+def test_publish_trusts_digest_stored_in_manifest():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.getsize("test_web_root/some_path").AndReturn(12)
+
+    entry = mox.CreateMockAnything()
+    entry.filename = u"test_web_root/some_path"
+    entry.size = 12
+    entry.digest = hashlib.md5("some_content").hexdigest()
+
+    manifest_mock = mox.CreateMockAnything()
+    manifest_mock.get("some_path").AndReturn(entry)
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock,
+                               manifest=manifest_mock,
+                               skip_unchanged=True)
+
+    assert instance.publish_from_path("some_path", content="some_content") is False
+    mox.VerifyAll()
+
+def test_publish_once_skips_paths_locked_elsewhere():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    locks = mox.CreateMockAnything()
+    locks.acquire("some_path").AndReturn(False)
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               single_flight=True,
+                               locks=locks)
+
+    assert instance.publish_once("some_path", content="some_content") is False
+    mox.VerifyAll()
+
+def test_publish_once_skips_paths_published_meanwhile():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+
+    locks = mox.CreateMockAnything()
+    locks.acquire("some_path").AndReturn(True)
+    locks.release("some_path")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock,
+                               single_flight=True,
+                               locks=locks)
+
+    assert instance.publish_once("some_path", content="some_content") is False
+    mox.VerifyAll()
+
+def test_crawl_publishes_reachable_pages_once():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root", SERVER_NAME="example.com")
+
+    mox.ReplayAll()
+
+    pages = {
+        "/": '<a href="/a/">a</a> <a href="/b/">b</a> <a href="/admin/">admin</a>',
+        "/a/": '<a href="/">home</a> <a href="/a/1/">1</a>',
+        "/b/": '<a href="/a/">a</a> <a href="/b/missing/">missing</a>',
+        "/a/1/": '<a href="/a/1/deeper/">deeper</a>',
+    }
+
+    instance = StaticGenerator("/",
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fail_silently=True)
+
+    def get_response_from_path(path):
+        if path not in pages:
+            raise StaticGeneratorException("missing")
+        return FakeResponse(pages[path])
+
+    published = []
+    instance.get_response_from_path = get_response_from_path
+    instance.publish_content = lambda path, content, content_type: published.append(path) or True
+
+    results = instance.crawl(max_depth=2, exclude=("/admin/",))
+
+    assert published == ["/", "/a/", "/b/", "/a/1/"]
+    assert results.written == 4
+    assert [outcome.path for outcome in results.failed] == ["/b/missing/"]
+    mox.VerifyAll()
+
+def test_delete_raises_when_unable_to_delete_file():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path").AndRaise(ValueError())
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+    
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
+
+    try:
+        instance.delete_from_path("some_path")
+    except StaticGeneratorException, e:
+        assert str(e) == 'Could not delete file: test_web_root/some_path'
+        mox.VerifyAll()
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
+def test_delete_ignores_folder_delete_when_unable_to_delete_folder():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path")
+    expect_unused_sidecars(fs_mock, "test_web_root/some_path")
+
+    fs_mock.rmdir("test_web_root").AndRaise(OSError())
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+    
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
+
+    instance.delete_from_path("some_path")
+
+    assert True, "Should work even when raising OSError"
+
+def test_delete_from_path():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join("test_web_root", "some_path").AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path")
+    expect_unused_sidecars(fs_mock, "test_web_root/some_path")
+
+    fs_mock.rmdir("test_web_root")
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
+    instance.directories.add("test_web_root")
+
+    instance.delete_from_path("some_path")
+
+    assert "test_web_root" not in instance.directories
+    mox.VerifyAll()
+
+def test_publish_loops_through_all_resources():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    f = mox.CreateMockAnything()
+    fs_mock.join('test_web_root', 'some_path_1').AndReturn('test_web_root/some_path_1')
+    fs_mock.dirname('test_web_root/some_path_1').AndReturn('test_web_root')
+    fs_mock.exists("test_web_root").AndReturn(True)
+    filename = "some_temp_file"
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path_1')
+
+    fs_mock.join('test_web_root', 'some_path_2').AndReturn('test_web_root/some_path_2')
+    fs_mock.dirname('test_web_root/some_path_2').AndReturn('test_web_root')
+    filename = "some_temp_file"
+    fs_mock.tempfile(directory="test_web_root").AndReturn([f, filename])
+    fs_mock.write(f, "some_content")
+    fs_mock.close(f)
+    fs_mock.chmod(filename, stat.S_IREAD | stat.S_IWRITE | stat.S_IWUSR | stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+    fs_mock.rename('some_temp_file', 'test_web_root/some_path_2')
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    try:
+        get_response_from_path = StaticGenerator.get_response_from_path
+        StaticGenerator.get_response_from_path = lambda self, path: FakeResponse("some_content")
+        instance = StaticGenerator("some_path_1", "some_path_2",
+                                   http_request=http_request,
+                                   model_base=model_base,
+                                   manager=manager,
+                                   model=model,
+                                   queryset=queryset,
+                                   settings=settings,
+                                   fs=fs_mock)
+
+        instance.publish()
+
+        mox.VerifyAll()
+    finally:
+        StaticGenerator.get_response_from_path = get_response_from_path
+
+def test_delete_loops_through_all_resources():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+
+    fs_mock = mox.CreateMockAnything()
+    fs_mock.join('test_web_root', 'some_path').AndReturn("test_web_root/some_path")
+    fs_mock.dirname("test_web_root/some_path").AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path")
+    expect_unused_sidecars(fs_mock, "test_web_root/some_path")
+    fs_mock.rmdir("test_web_root")
+
+    fs_mock.join('test_web_root', 'some_path_2').AndReturn("test_web_root/some_path_2")
+    fs_mock.dirname('test_web_root/some_path_2').AndReturn("test_web_root")
+    fs_mock.exists("test_web_root/some_path_2").AndReturn(True)
+    fs_mock.remove("test_web_root/some_path_2")
+    expect_unused_sidecars(fs_mock, "test_web_root/some_path_2")
+    fs_mock.rmdir("test_web_root")
+
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("some_path", "some_path_2", 
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               fs=fs_mock)
+
+    instance.delete()
+
+    mox.VerifyAll()
+    
+def test_can_create_dummy_handler():
 
     mox = Mox()
     handler = DummyHandler()
@@ -612,6 +1322,248 @@ def test_can_create_dummy_handler():
     
     assert result == ('foo', 'bar')
 
+def test_dummy_handler_loads_middleware_once():
+    handler = DummyHandler()
+
+    loaded = []
+    def load_middleware():
+        loaded.append(True)
+        handler._request_middleware = []
+        handler._response_middleware = []
+
+    handler.load_middleware = load_middleware
+    handler.get_response = lambda request: 'bar'
+
+    handler('foo')
+    handler('foo')
+
+    assert len(loaded) == 1
+
+def test_dummy_handler_loads_middleware_once_across_threads():
+    handler = DummyHandler()
+
+    loaded = []
+    def load_middleware():
+        loaded.append(True)
+        handler._response_middleware = []
+        time.sleep(0.05)
+        handler._response_middleware.append(lambda request, response: response + '!')
+
+    handler.load_middleware = load_middleware
+    handler.get_response = lambda request: request
+
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(handler('foo'))) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loaded) == 1
+    assert responses == ['foo!'] * 4
+
+def test_render_engine_renders_many_paths_with_one_handler():
+    mox = Mox()
+
+    http_request = mox.CreateMockAnything()
+    handler_mock = mox.CreateMockAnything()
+
+    for path in ('/a/', '/b/'):
+        request_mock = mox.CreateMockAnything()
+        request_mock.META = mox.CreateMockAnything()
+        request_mock.META.setdefault('SERVER_PORT', 80)
+        request_mock.META.setdefault('SERVER_NAME', 'some_server')
+        http_request.__call__().AndReturn(request_mock)
+        handler_mock.__call__(request_mock).AndReturn('response for %s' % path)
+
+    mox.ReplayAll()
+
+    engine = RenderEngine(http_request, 'some_server', handler_mock)
+    result = list(engine.render_many(['/a/', '/b/']))
+
+    assert result == [('/a/', 'response for /a/'), ('/b/', 'response for /b/')]
+    mox.VerifyAll()
+
+class FakeMeta(object):
+    app_label = 'blog'
+    object_name = 'Post'
+
+class FakePost(object):
+    _meta = FakeMeta()
+
+    def __init__(self, pk):
+        self.pk = pk
+
+def test_get_content_from_path_records_dependencies():
+    from staticgenerator.staticgenerator import dependencies
+
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    response = mox.CreateMockAnything()
+    response.status_code = 200
+    response.content = "some_content"
+    response.streaming = False
+
+    render_engine = mox.CreateMockAnything()
+    render_engine.render("/blog/").WithSideEffects(
+        lambda path: dependencies.depends_on(FakePost(1), FakePost(2))).AndReturn(response)
+
+    manifest_mock = mox.CreateMockAnything()
+    manifest_mock.set_dependencies("/blog/", set([("blog.post", u"1"), ("blog.post", u"2")]))
+    manifest_mock.dependents("blog.post", u"1").AndReturn(["/blog/"])
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               render_engine=render_engine,
+                               manifest=manifest_mock,
+                               track_dependencies=True)
+
+    assert instance.get_content_from_path("/blog/") == "some_content"
+    assert instance.dependents(FakePost(1)) == ["/blog/"]
+    mox.VerifyAll()
+
+def test_tracking_dependencies_requires_a_manifest():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    try:
+        StaticGenerator(http_request=http_request,
+                        model_base=model_base,
+                        manager=manager,
+                        model=model,
+                        queryset=queryset,
+                        settings=settings,
+                        track_dependencies=True)
+    except StaticGeneratorException, e:
+        assert str(e) == 'Tracking dependencies needs STATIC_GENERATOR_MANIFEST in settings.py'
+        mox.VerifyAll()
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
+class FakeRequest(object):
+    def __init__(self, path_info):
+        self.path_info = path_info
+        self.seen = []
+
+class NewStyleMiddleware(object):
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.seen.append('new')
+        return self.get_response(request)
+
+    def process_view(self, request, view, args, kwargs):
+        request.seen.append('view %s' % kwargs['n'])
+
+class OldStyleMiddleware(object):
+    def process_request(self, request):
+        request.seen.append('request')
+
+    def process_response(self, request, response):
+        request.seen.append('response')
+        return response
+
+def test_fast_handler_calls_view_through_given_middleware_only():
+    from staticgenerator.staticgenerator import handlers
+
+    def view(request, n):
+        request.seen.append('called')
+        return 'page %s' % n
+
+    classes = {'new': NewStyleMiddleware, 'old': OldStyleMiddleware}
+    resolve, import_string = handlers.resolve, handlers.import_string
+    handlers.resolve = lambda path: (view, (), {'n': path.strip('/')})
+    handlers.import_string = classes.get
+    try:
+        handler = handlers.get_handler('fast', ('new', 'old'))
+        request = FakeRequest('/1/')
+        response = handler(request)
+    finally:
+        handlers.resolve, handlers.import_string = resolve, import_string
+
+    assert response == 'page 1'
+    assert request.seen == ['new', 'request', 'view 1', 'called', 'response']
+
+def test_fast_handler_returns_404_for_missing_pages():
+    from staticgenerator.staticgenerator import handlers
+    from django.http import Http404
+
+    def view(request):
+        raise Http404()
+
+    def resolve(path):
+        if path == '/missing/':
+            raise handlers.Resolver404()
+        return view, (), {}
+
+    class NotFound(object):
+        status_code = 404
+
+    original = handlers.resolve, handlers.HttpResponseNotFound
+    handlers.resolve, handlers.HttpResponseNotFound = resolve, NotFound
+    try:
+        handler = handlers.FastHandler()
+        assert handler(FakeRequest('/missing/')).status_code == 404
+        assert handler(FakeRequest('/gone/')).status_code == 404
+    finally:
+        handlers.resolve, handlers.HttpResponseNotFound = original
+
+def test_unknown_render_mode_raises():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root", SERVER_NAME="localhost", STATIC_GENERATOR_RENDER="quick")
+
+    mox.ReplayAll()
+
+    try:
+        StaticGenerator(http_request=http_request,
+                        model_base=model_base,
+                        manager=manager,
+                        model=model,
+                        queryset=queryset,
+                        settings=settings)
+    except StaticGeneratorException, e:
+        assert str(e) == 'Unknown render mode "quick". Choose one of: full, fast'
+        mox.VerifyAll()
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
+def test_unknown_executor_raises():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root", SERVER_NAME="localhost")
+
+    mox.ReplayAll()
+
+    try:
+        StaticGenerator(http_request=http_request,
+                        model_base=model_base,
+                        manager=manager,
+                        model=model,
+                        queryset=queryset,
+                        settings=settings,
+                        executor="fibers")
+    except StaticGeneratorException, e:
+        assert str(e) == 'Unknown executor "fibers". Choose one of: process, serial, thread'
+        mox.VerifyAll()
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
 def test_bad_request_raises_proper_exception():
     mox = Mox()
 
@@ -697,6 +1649,7 @@ def test_not_found_raises_proper_exception():
         result = instance.get_content_from_path(path_mock)
     except StaticGeneratorException, e:
         assert str(e) == 'The requested page("some_path") returned http code 404. Static Generation failed.'
+        assert e.status_code == 404
         mox.VerifyAll()
         return
     finally:
@@ -746,3 +1699,109 @@ def test_request_exception_raises_proper_exception():
 
     assert False, "Shouldn't have gotten this far."
 
+
+def test_publish_stops_at_first_failure():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("some_path_1", "some_path_2", "some_path_3",
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings)
+
+    calls = []
+    def func(path):
+        calls.append(path)
+        if path == "some_path_2":
+            raise StaticGeneratorException("failed")
+
+    try:
+        instance.do_all(func)
+    except StaticGeneratorException, e:
+        assert str(e) == "failed"
+        assert calls == ["some_path_1", "some_path_2"]
+        mox.VerifyAll()
+        return
+
+    assert False, "Shouldn't have gotten this far."
+
+def test_publish_continues_past_failures_when_failing_silently():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root")
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator("some_path_1", "some_path_2", "some_path_3",
+                               http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings,
+                               executor="thread",
+                               workers=2,
+                               fail_silently=True)
+
+    def func(path):
+        if path == "some_path_2":
+            raise StaticGeneratorException("failed")
+        return path
+
+    results = instance.do_all(func)
+
+    assert [outcome.path for outcome in results] == ["some_path_1", "some_path_2", "some_path_3"]
+    assert [outcome.value for outcome in results] == ["some_path_1", None, "some_path_3"]
+    assert [outcome.path for outcome in results.failed] == ["some_path_2"]
+    mox.VerifyAll()
+
+def test_get_index_name_by_content_type():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root",
+                              STATIC_GENERATOR_CONTENT_TYPES={"text/csv": "index.csv"})
+
+    mox.ReplayAll()
+
+    instance = StaticGenerator(http_request=http_request,
+                               model_base=model_base,
+                               manager=manager,
+                               model=model,
+                               queryset=queryset,
+                               settings=settings)
+
+    assert instance.get_index_name(None) == "index.html"
+    assert instance.get_index_name("text/html; charset=utf-8") == "index.html"
+    assert instance.get_index_name("Application/JSON") == "index.json"
+    assert instance.get_index_name("application/rss+xml; charset=utf-8") == "index.rss"
+    assert instance.get_index_name("text/csv") == "index.csv"
+    assert instance.get_index_name("image/png") == "index.html"
+    assert instance.get_path_from_filename("test_web_root/feed/index.rss.gz") == u"/feed/"
+    mox.VerifyAll()
+
+def test_content_type_map_needs_manifest():
+    mox = Mox()
+    http_request, model_base, manager, model, queryset = get_mocks(mox)
+    settings = CustomSettings(WEB_ROOT="test_web_root",
+                              STATIC_GENERATOR_CONTENT_TYPE_MAP="types.map")
+
+    mox.ReplayAll()
+
+    try:
+        StaticGenerator(http_request=http_request,
+                        model_base=model_base,
+                        manager=manager,
+                        model=model,
+                        queryset=queryset,
+                        settings=settings)
+    except StaticGeneratorException, e:
+        assert str(e) == 'The content type map needs STATIC_GENERATOR_MANIFEST in settings.py'
+        mox.VerifyAll()
+        return
+    assert False, "Shouldn't have gotten this far."
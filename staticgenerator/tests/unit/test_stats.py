@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+from staticgenerator.staticgenerator.stats import Stats
+
+def test_stats_totals_phases():
+    stats = Stats()
+    stats.record('render', '/a/', 0.5, 100)
+    stats.record('render', '/b/', 1.5, 300)
+    stats.record('write', '/a/', 0.25, 100)
+
+    assert stats.phases['render'] == [2, 2.0, 400]
+    assert stats.phases['write'] == [1, 0.25, 100]
+    assert stats.sizes == {'/a/': 100, '/b/': 300}
+
+def test_stats_finds_slowest_paths():
+    stats = Stats()
+    stats.record('render', '/a/', 0.5)
+    stats.record('write', '/a/', 0.25)
+    stats.record('render', '/b/', 1.5)
+    stats.record('render', '/c/', 0.1)
+
+    slowest = stats.slowest(2)
+
+    assert [path for seconds, path, phases in slowest] == ['/b/', '/a/']
+    assert slowest[1][2] == {'render': 0.5, 'write': 0.25}
+
+def test_stats_timer_records_phase():
+    stats = Stats()
+    with stats.timer('write', '/a/') as timer:
+        timer.size = 10
+
+    assert stats.phases['write'][0] == 1
+    assert stats.sizes['/a/'] == 10
+
+def test_stats_report_lists_failures_and_slowest_paths():
+    stats = Stats()
+    stats.record('render', '/a/', 0.5, 100)
+    stats.fail('/b/', 'boom')
+
+    report = stats.report()
+
+    assert 'render' in report
+    assert '/b/: boom' in report
+    assert '0.500s  /a/  (render 0.500s)' in report
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import hashlib
+
+from staticgenerator.staticgenerator.variants import Variants
+
+variants = Variants(params=('page', 'sort'), headers=('Accept-Language',))
+
+def test_key_is_sorted_and_keeps_first_non_empty_value():
+    assert variants.get_key([('sort', 'new'), ('page', ''), ('page', '3'), ('page', '4')]) == 'page=3&sort=new'
+    assert variants.get_key([('utm_source', 'feed')]) == ''
+    assert variants.get_key([('sort', u'caf\xe9 & co')]) == 'sort=caf%C3%A9%20%26%20co'
+
+def test_request_key_normalizes_headers():
+    meta = {'HTTP_ACCEPT_LANGUAGE': 'EN-us, en;q=0.5'}
+
+    assert variants.get_request_key('sort=new&page=3', meta) == 'accept-language=en-us%2Cen%3Bq%3D0.5&page=3&sort=new'
+    assert variants.get_request_key('', {}) == ''
+
+def test_request_key_is_none_for_unknown_parameters():
+    assert variants.get_request_key('page=3&filter=draft', {}) is None
+
+def test_request_key_is_none_for_repeated_or_empty_parameters():
+    assert variants.get_request_key('page=3&page=4', {}) is None
+    assert variants.get_request_key('page=&sort=new', {}) is None
+    assert variants.get_request_key('page', {}) is None
+
+def test_split_and_get_request_round_trip():
+    path, key = variants.split(u'/blog/?sort=new&accept-language=fr&page=2')
+
+    assert (path, key) == (u'/blog/', 'accept-language=fr&page=2&sort=new')
+    assert variants.get_request(key) == ('page=2&sort=new', {'HTTP_ACCEPT_LANGUAGE': 'fr'})
+    assert variants.split('/blog/') == ('/blog/', '')
+
+def test_filename_keeps_the_extension():
+    assert variants.get_filename('/www/blog/index.html', 'page=3') == '/www/blog/index@page=3.html'
+    assert variants.get_filename('/www/feed', 'page=3') == '/www/feed@page=3'
+    assert variants.parse_filename('index@page=3.html') == ('index.html', 'page=3')
+    assert variants.parse_filename('feed@page=3') == ('feed', 'page=3')
+    assert variants.parse_filename('index.html') == ('index.html', None)
+    assert Variants().parse_filename('@bob') == ('@bob', None)
+
+def test_long_keys_are_hashed():
+    key = 'sort=' + 'x' * 200
+    filename = variants.get_filename('/www/blog/index.html', key)
+
+    assert filename == '/www/blog/index@%s.html' % hashlib.md5(key).hexdigest()
+    assert variants.parse_filename(filename.split('/')[-1]) == ('index.html', hashlib.md5(key).hexdigest())
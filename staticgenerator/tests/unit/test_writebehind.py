@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+import threading
+
+from staticgenerator.staticgenerator.writebehind import WriteBehindQueue, QueueFull
+
+def test_queue_publishes_in_background():
+    published = []
+    queue = WriteBehindQueue(lambda path, content: published.append((path, content)))
+
+    queue.put('/a/', 'content a')
+    queue.put('/b/', 'content b')
+    queue.flush()
+
+    assert published == [('/a/', 'content a'), ('/b/', 'content b')]
+    queue.close()
+
+def test_queue_coalesces_waiting_paths():
+    published = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def publish(path, content):
+        started.set()
+        release.wait()
+        published.append((path, content))
+
+    queue = WriteBehindQueue(publish)
+    queue.put('/busy/', 'busy')
+    started.wait()
+
+    queue.put('/a/', 'old')
+    queue.put('/a/', 'new')
+    release.set()
+    queue.close()
+
+    assert published == [('/busy/', 'busy'), ('/a/', 'new')]
+
+def test_queue_drops_writes_when_full():
+    started = threading.Event()
+    release = threading.Event()
+
+    def publish(path, content):
+        started.set()
+        release.wait()
+
+    queue = WriteBehindQueue(publish, size=1, policy='drop')
+
+    queue.put('/a/', 'a')
+    started.wait()
+    queue.put('/b/', 'b')
+    try:
+        queue.put('/c/', 'c')
+        assert False, "Shouldn't have gotten this far."
+    except QueueFull:
+        pass
+
+    assert queue.dropped == 1
+    release.set()
+    queue.close()
+
+def test_queue_keeps_going_after_a_failed_write():
+    published = []
+    def publish(path, content):
+        if path == '/bad/':
+            raise ValueError('bad')
+        published.append(path)
+
+    queue = WriteBehindQueue(publish)
+    queue.put('/bad/', 'bad')
+    queue.put('/good/', 'good')
+    queue.close()
+
+    assert published == ['/good/']
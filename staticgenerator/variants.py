@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""
+Variants of a page selected by its query string or request headers.
+
+Only the query parameters and headers listed in the settings select a
+variant. Their values are normalized into a key, such as 'page=3&sort=new',
+which is added to the page's path ('/blog/?page=3&sort=new') and to its file
+name ('blog/index@page=3&sort=new.html'), so that each variant is published
+to its own file and a front-end can build the same name from the request.
+Keys too long for a file name are replaced by their md5 digest.
+"""
+import hashlib
+from urllib import quote, unquote
+from urlparse import parse_qsl
+
+# Keys longer than this are hashed, keeping file names well under the 255
+# bytes most file systems allow
+MAX_KEY_LENGTH = 100
+
+SEPARATOR = '@'
+
+
+def normalize_header(value):
+    return ''.join(value.lower().split())
+
+def get_meta_name(header):
+    """Returns the request.META name of a header, as Django's handlers set it"""
+    return 'HTTP_' + header.upper().replace('-', '_')
+
+
+class Variants(object):
+    """
+    The query parameters and headers that select a variant of a page. With
+    neither, pages have no variants.
+    """
+
+    def __init__(self, params=(), headers=()):
+        self.params = tuple(params)
+        self.headers = tuple(header.lower() for header in headers)
+
+    def __nonzero__(self):
+        return bool(self.params or self.headers)
+
+    def get_key(self, parts):
+        """
+        Returns the normalized key of (name, value) pairs: the first
+        non-empty value of every known name, sorted by name. Unknown names
+        are left out.
+        """
+        values = {}
+        for name, value in parts:
+            if name in self.headers:
+                value = normalize_header(value)
+            elif name not in self.params:
+                continue
+            if value and name not in values:
+                if isinstance(value, unicode):
+                    value = value.encode('utf-8')
+                values[name] = quote(value, safe='-_.~')
+        return '&'.join('%s=%s' % (name, values[name]) for name in sorted(values))
+
+    def get_request_key(self, query_string, meta):
+        """
+        Returns the key of a request, or None if its query string has
+        parameters that do not select a variant, and so may change the page
+        in ways its file name would not tell. Parameters given twice or
+        without a value give None too: views read the last of repeated
+        values (request.GET['page']) where the key would hold the first.
+        """
+        parts = parse_qsl(query_string, keep_blank_values=True)
+        names = [name for name, value in parts]
+        if any(name not in self.params or not value for name, value in parts) \
+                or len(set(names)) != len(names):
+            return None
+        for header in self.headers:
+            value = meta.get(get_meta_name(header))
+            if value:
+                parts.append((header, value))
+        return self.get_key(parts)
+
+    def split(self, path):
+        """Returns (path, key) for a path that may end with ?key"""
+        if '?' not in path:
+            return path, ''
+        path, query_string = path.split('?', 1)
+        return path, self.get_key(parse_qsl(query_string))
+
+    def get_request(self, key):
+        """Returns the (query string, META) that render the variant of key"""
+        query = []
+        meta = {}
+        for part in key.split('&'):
+            name, value = part.split('=', 1)
+            if name in self.headers:
+                meta[get_meta_name(name)] = unquote(value)
+            else:
+                query.append(part)
+        return '&'.join(query), meta
+
+    def get_filename(self, filename, key):
+        """Adds key to filename, before its extension: index@page=3.html"""
+        if len(key) > MAX_KEY_LENGTH:
+            key = hashlib.md5(key).hexdigest()
+        directory, _, name = filename.rpartition('/')
+        base, dot, extension = name.rpartition('.')
+        if not dot or not base:
+            base, dot, extension = name, '', ''
+        name = base + SEPARATOR + key + dot + extension
+        return directory and directory + '/' + name or name
+
+    def parse_filename(self, name):
+        """
+        Returns (name, key) for the file name of a variant, (name, None) for
+        other files. The key of a hashed variant is its md5 digest.
+        """
+        if not self or SEPARATOR not in name:
+            return name, None
+        base, _, rest = name.rpartition(SEPARATOR)
+        key, dot, extension = rest.rpartition('.')
+        if not dot:
+            key, extension = rest, ''
+        if not base or not key:
+            return name, None
+        return base + dot + extension, key
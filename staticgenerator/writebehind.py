@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#-*- coding:utf-8 -*-
+
+"""Background publishing for StaticGeneratorMiddleware."""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger('staticgenerator')
+
+
+class QueueFull(Exception):
+    pass
+
+class WriteBehindQueue(object):
+    """
+    Hands (path, content) pairs to writer threads so the response that
+    produced them doesn't wait on the file system.
+
+    Writes are coalesced by path: queuing a path that is still waiting only
+    replaces its content. When ``size`` paths are waiting, put() either
+    blocks until a writer catches up (policy 'block') or drops the new write
+    (policy 'drop'); dropped pages are simply generated again on a later
+    request.
+    """
+
+    policies = ('block', 'drop')
+
+    def __init__(self, publish, size=1000, workers=1, policy='block'):
+        if policy not in self.policies:
+            raise ValueError('Unknown queue policy "%s". Choose one of: %s' % (policy, ', '.join(self.policies)))
+        self.publish = publish
+        self.size = size
+        self.workers = workers
+        self.policy = policy
+
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.order = deque()
+        self.active = 0
+        self.dropped = 0
+        self.closed = False
+        self.threads = []
+        self.pid = None
+
+    def start(self):
+        """Starts the writers; called on first use, once per process"""
+        self.pid = os.getpid()
+        self.threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.run, name='staticgenerator-writer-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, path, content, *args):
+        """
+        Queues content to be published at path; publish is called with
+        (path, content, *args)
+        """
+        content = (content,) + args
+        with self.condition:
+            if self.closed:
+                raise QueueFull('The queue is closed')
+            if self.pid != os.getpid():
+                # Threads don't survive a fork; each worker process gets its own
+                self.start()
+            if path in self.pending:
+                self.pending[path] = content
+                return
+            while len(self.pending) >= self.size:
+                if self.policy == 'drop':
+                    self.dropped += 1
+                    raise QueueFull('Dropped %s, %d writes are already waiting' % (path, self.size))
+                self.condition.wait()
+            self.pending[path] = content
+            self.order.append(path)
+            self.condition.notify_all()
+
+    def get(self):
+        with self.condition:
+            while not self.order and not self.closed:
+                self.condition.wait()
+            if not self.order:
+                return None, ()
+            path = self.order.popleft()
+            content = self.pending.pop(path)
+            self.active += 1
+            self.condition.notify_all()
+            return path, content
+
+    def done(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            path, args = self.get()
+            if path is None:
+                return
+            try:
+                self.publish(path, *args)
+            except Exception:
+                logger.exception('Could not publish %s', path)
+            finally:
+                self.done()
+
+    def flush(self):
+        """Blocks until every queued write has been published"""
+        with self.condition:
+            while (self.order or self.active) and self.threads:
+                self.condition.wait()
+
+    def close(self):
+        """Publishes whatever is still queued, then stops the writers"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.pid == os.getpid():
+            for thread in self.threads:
+                thread.join()
+
+
+def create_queue(publish, settings):
+    """
+    Returns a started-on-demand WriteBehindQueue configured from settings,
+    or None when STATIC_GENERATOR_ASYNC is not set.
+    """
+    if not getattr(settings, 'STATIC_GENERATOR_ASYNC', False):
+        return None
+    queue = WriteBehindQueue(publish,
+                             size=getattr(settings, 'STATIC_GENERATOR_QUEUE_SIZE', 1000),
+                             workers=getattr(settings, 'STATIC_GENERATOR_QUEUE_WORKERS', 1),
+                             policy=getattr(settings, 'STATIC_GENERATOR_QUEUE_POLICY', 'block'))
+    atexit.register(queue.close)
+    return queue